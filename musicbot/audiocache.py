@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import logging
+from asyncio import ensure_future
+
+from .utils import format_size
+
+log = logging.getLogger(__name__)
+
+# files youtube_dl leave behind while downloading, they are not playable
+_partial_suffixes = ('.part', '.ytdl', '.temp')
+
+class AudioCacheIndex:
+    """
+    In-memory index of the files in the audio cache folder so that finding a cached file
+    does not require listing the folder. Files are keyed by their name, and can be looked up
+    by the source url they were downloaded from or by the file name youtube_dl would have used.
+    """
+    def __init__(self, folder, path):
+        self.folder = folder
+        self.path = path
+        self._files = dict()
+        self._urls = dict()
+        self._stems = dict()
+        self._generic_stems = dict()
+        self._save_handle = None
+
+        self.rebuild()
+
+    def __len__(self):
+        return len(self._files)
+
+    @staticmethod
+    def _stem(name):
+        return name.rsplit('.', 1)[0]
+
+    @staticmethod
+    def _generic_stem(name):
+        # generic extractor files have 8 characters of their hash appended, see YtdlUrlEntry._really_download
+        return name.rsplit('-', 1)[0]
+
+    def _link(self, name):
+        record = self._files[name]
+        if record.get('source_url'):
+            self._urls[record['source_url']] = name
+        self._stems[self._stem(name)] = name
+        self._generic_stems[self._generic_stem(name)] = name
+
+    def _unlink(self, name):
+        record = self._files.pop(name, None)
+        if not record:
+            return
+        if record.get('source_url') and self._urls.get(record['source_url']) == name:
+            del self._urls[record['source_url']]
+        if self._stems.get(self._stem(name)) == name:
+            del self._stems[self._stem(name)]
+        if self._generic_stems.get(self._generic_stem(name)) == name:
+            del self._generic_stems[self._generic_stem(name)]
+
+    def rebuild(self):
+        """
+        Load the saved index and reconcile it with the folder content. Files whose size and
+        modification time did not change keep their recorded information.
+        """
+        saved = dict()
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf8') as f:
+                    saved = json.load(f)
+            except Exception:
+                log.warning('Could not load audio cache index from {}, rebuilding it'.format(self.path), exc_info=True)
+
+        self._files.clear()
+        self._urls.clear()
+        self._stems.clear()
+        self._generic_stems.clear()
+
+        if not os.path.isdir(self.folder):
+            return
+
+        reused = 0
+        # not using scandir as a context manager, which needs Python 3.6
+        for dentry in os.scandir(self.folder):
+            if not dentry.is_file() or dentry.name.endswith(_partial_suffixes):
+                continue
+            stat = dentry.stat()
+            record = saved.get(dentry.name)
+            if record and record.get('size') == stat.st_size and record.get('mtime') == stat.st_mtime:
+                reused += 1
+            else:
+                record = {'size': stat.st_size, 'mtime': stat.st_mtime, 'last_used': stat.st_mtime, 'plays': 0}
+            self._files[dentry.name] = record
+            self._link(dentry.name)
+
+        log.debug('Indexed {} files in audio cache ({} reused from saved index)'.format(len(self._files), reused))
+
+    def save(self):
+        self._save_handle = None
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            with open(self.path, 'w', encoding='utf8') as f:
+                json.dump(self._files, f)
+        except Exception:
+            log.warning('Could not save audio cache index to {}'.format(self.path), exc_info=True)
+
+    def schedule_save(self, loop, delay=30):
+        if not self._save_handle:
+            self._save_handle = loop.call_later(delay, self.save)
+
+    def _checked(self, name):
+        if name is None:
+            return None
+        path = os.path.join(self.folder, name)
+        if not os.path.isfile(path):
+            # someone removed it behind our back
+            self._unlink(name)
+            return None
+        return path
+
+    def lookup_url(self, source_url):
+        return self._checked(self._urls.get(source_url))
+
+    def lookup_filename(self, filename):
+        """
+        Look up file by the file name youtube_dl would give it, allowing different extension.
+        """
+        name = os.path.basename(filename)
+        if name in self._files:
+            return self._checked(name)
+        return self._checked(self._stems.get(self._stem(name)))
+
+    def lookup_generic(self, filename):
+        return self._checked(self._generic_stems.get(self._stem(os.path.basename(filename))))
+
+    def get(self, path):
+        return self._files.get(os.path.basename(path))
+
+    def add(self, path, **info):
+        name = os.path.basename(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            log.warning('Cannot index {}, file does not exist'.format(path))
+            return
+
+        old = self._files.get(name, dict())
+        self._unlink(name)
+        record = {k: v for k, v in info.items() if v is not None}
+        record.update(
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            last_used=time.time(),
+            plays=old.get('plays', 0)
+        )
+        self._files[name] = record
+        self._link(name)
+
+    def update(self, path, **info):
+        record = self._files.get(os.path.basename(path))
+        if record is not None:
+            record.update(info)
+
+    def touch(self, path):
+        """
+        Record that the file got played.
+        """
+        record = self._files.get(os.path.basename(path))
+        if record is not None:
+            record['last_used'] = time.time()
+            record['plays'] = record.get('plays', 0) + 1
+
+    def total_size(self):
+        return sum(record['size'] for record in self._files.values())
+
+    def items(self):
+        return self._files.items()
+
+    def remove(self, path):
+        self._unlink(os.path.basename(path))
+
+    def clear(self):
+        self._files.clear()
+        self._urls.clear()
+        self._stems.clear()
+        self._generic_stems.clear()
+
+class AudioCacheEvictor:
+    """
+    Keep the audio cache folder under a size limit by deleting files nobody queued,
+    least recently played (lru) or least often played (lfu) first.
+    """
+    def __init__(self, index, limit, policy, pinned):
+        self.index = index
+        self.limit = limit
+        self.policy = policy
+        # callable returning the set of file names that must not be deleted
+        self.pinned = pinned
+        self.evicted = 0
+        self.evicted_bytes = 0
+        self._task = None
+
+    def _sort_key(self, item):
+        name, record = item
+        last_used = record.get('last_used', record['mtime'])
+        if self.policy == 'lfu':
+            return (record.get('plays', 0), last_used)
+        return last_used
+
+    def select(self):
+        """
+        Return list of file names to delete to get back under the limit.
+        """
+        total = self.index.total_size()
+        if not self.limit or total <= self.limit:
+            return []
+
+        pinned = self.pinned()
+        victims = []
+        for name, record in sorted(self.index.items(), key=self._sort_key):
+            if total <= self.limit:
+                break
+            if name in pinned:
+                continue
+            victims.append(name)
+            total -= record['size']
+
+        if total > self.limit:
+            log.warning('Audio cache is {} even after eviction, queued songs alone exceed the storage limit of {}'.format(
+                format_size(total),
+                format_size(self.limit)
+            ))
+
+        return victims
+
+    def _delete(self, names):
+        deleted = []
+        for name in names:
+            try:
+                os.unlink(os.path.join(self.index.folder, name))
+                deleted.append(name)
+            except FileNotFoundError:
+                deleted.append(name)
+            except OSError:
+                log.warning('Could not evict {} from audio cache'.format(name), exc_info=True)
+        return deleted
+
+    async def _evict(self, loop):
+        try:
+            victims = self.select()
+            if not victims:
+                return
+
+            sizes = {name: self.index.get(name)['size'] for name in victims}
+            deleted = await loop.run_in_executor(None, self._delete, victims)
+            for name in deleted:
+                self.index.remove(name)
+                self.evicted += 1
+                self.evicted_bytes += sizes[name]
+
+            log.debug('Evicted {} files ({}) from audio cache'.format(len(deleted), format_size(sum(sizes[name] for name in deleted))))
+            self.index.schedule_save(loop)
+        except Exception:
+            log.error('Error while evicting audio cache', exc_info=True)
+        finally:
+            self._task = None
+
+    def schedule(self, loop):
+        """
+        Start eviction in the background unless it is already running.
+        """
+        if self.limit and not self._task:
+            self._task = ensure_future(self._evict(loop), loop=loop)
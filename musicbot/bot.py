@@ -66,6 +66,7 @@ from .permissions import Permissions, PermissionsDefaults
 from .alias import Alias, AliasDefaults
 from .json import Json
 from .spotify import Spotify
+from .spotifymatch import SpotifyMatchStore
 from . import exceptions
 
 MODUBOT_MAJOR = '0'
@@ -163,6 +164,8 @@ class ModuBot(Bot):
                 self.log.warning('There was a problem initialising the connection to Spotify using guest mode. Details: {0}.'.format(e))
                 self.config._spotify = False
 
+        self.spotify_matches = SpotifyMatchStore('data/spotify_matches.json', self.config.spotify_match_max_age * 24 * 60 * 60)
+
         self.looplock = threading.Lock()
         self._init = False
 
@@ -442,10 +445,13 @@ class ModuBot(Bot):
 
         if not self.config.save_videos and os.path.isdir(AUDIO_CACHE_PATH):
             if self._delete_old_audiocache():
+                self.downloader.cache_index.clear()
                 self.log.debug("Deleted old audio cache")
             else:
                 self.log.debug("Could not delete old audio cache, moving on.")
 
+        self.downloader.cache_evictor.schedule(self.loop)
+
 
     async def _scheck_server_permissions(self):
         self.log.debug("Checking server permissions")
@@ -813,6 +819,7 @@ class ModuBot(Bot):
             self.log.debug('----------[  END CANCELLED  ]----------')
         self.loop.run_until_complete(await_gathered())
         self.downloader.shutdown()
+        self.spotify_matches.save()
         self.log.info('finished!')
         
         self._init = False
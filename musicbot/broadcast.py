@@ -0,0 +1,192 @@
+"""
+Sharing one live stream between every guild playing it.
+
+A StreamBroadcast runs a single FFmpeg process for a stream and keeps the last few seconds of
+decoded audio. Every guild playing the stream gets a BroadcastSubscriber, which is an opus
+AudioSource. Subscribers at the same volume share one opus encoder and its encoded frames, so the
+work done scales with the number of unique streams (and volumes) instead of guilds. Reads come
+from the voice clients' player threads; the fastest subscriber drives the decoding. Only that
+subscriber waits for FFmpeg, the others keep reading what is buffered already.
+
+Joining subscribers start at the live edge, so this is only meant for live streams.
+"""
+
+import audioop
+import threading
+from collections import deque, defaultdict
+
+from discord import opus
+from discord.player import AudioSource
+
+class _EncodedFrames:
+    def __init__(self, volume):
+        self.volume = volume
+        self.encoder = opus.Encoder()
+        self.frames = dict()
+        self.last_index = -1
+
+    def get(self, index, pcm, oldest):
+        self.last_index = max(self.last_index, index)
+        packet = self.frames.get(index)
+        if packet is None:
+            if self.volume != 1.0:
+                pcm = audioop.mul(pcm, 2, min(self.volume, 2.0))
+            packet = self.encoder.encode(pcm, opus.Encoder.SAMPLES_PER_FRAME)
+            self.frames[index] = packet
+            for old in [i for i in self.frames if i < oldest]:
+                del self.frames[old]
+        return packet
+
+class StreamBroadcast:
+    def __init__(self, key, source_factory, buffer_frames):
+        self.key = key
+        # creates the PCM AudioSource, e.g. FFmpegPCMAudio of the stream
+        self._source_factory = source_factory
+        self._source = None
+        # guards the buffered frames and encoders, held only briefly
+        self._lock = threading.Lock()
+        # held by the one subscriber reading from the source
+        self._read_lock = threading.Lock()
+        self._frames = deque(maxlen=buffer_frames)
+        # frame index of self._frames[0]
+        self._base = 0
+        self._groups = dict()
+        self.subscribers = 0
+        self.ended = False
+        self.closed = False
+
+    @property
+    def head(self):
+        return self._base + len(self._frames)
+
+    @property
+    def source(self):
+        return self._source
+
+    def _fill(self, index):
+        """
+        Read from the source until frame index is buffered. Called without holding self._lock.
+        """
+        with self._read_lock:
+            while True:
+                with self._lock:
+                    if self.closed or self.ended or index < self.head:
+                        return
+                    source = self._source
+
+                if source is None:
+                    source = self._source_factory()
+                    with self._lock:
+                        if self.closed:
+                            source.cleanup()
+                            return
+                        self._source = source
+
+                data = source.read()
+                with self._lock:
+                    if self.closed:
+                        return
+                    if not data:
+                        self.ended = True
+                        return
+                    if len(self._frames) == self._frames.maxlen:
+                        self._base += 1
+                    self._frames.append(data)
+
+    def read(self, subscriber):
+        with self._lock:
+            if self.closed:
+                return b''
+
+            if subscriber.position is None or subscriber.position < self._base:
+                # just joined, or was paused longer than what is kept: continue live
+                subscriber.position = max(self.head - 1, self._base)
+            index = subscriber.position
+            buffered = index < self.head
+
+        if not buffered:
+            self._fill(index)
+
+        with self._lock:
+            if self.closed or index >= self.head:
+                return b''
+            # fell out of what is kept while waiting for the source
+            index = max(index, self._base)
+            pcm = self._frames[index - self._base]
+            subscriber.position = index + 1
+
+            volume = round(subscriber.volume, 2)
+            group = self._groups.get(volume)
+            if not group:
+                # drop encoders of volumes nobody reads anymore
+                for stale in [v for v, g in self._groups.items() if g.last_index < self._base]:
+                    del self._groups[stale]
+                group = self._groups[volume] = _EncodedFrames(volume)
+            return group.get(index, pcm, self._base)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            if self._source:
+                self._source.cleanup()
+                self._source = None
+            self._frames.clear()
+            self._groups.clear()
+
+class BroadcastSubscriber(AudioSource):
+    def __init__(self, hub, broadcast, volume):
+        self._hub = hub
+        self.broadcast = broadcast
+        self.volume = volume
+        self.position = None
+        self._unsubscribed = False
+
+    def is_opus(self):
+        return True
+
+    def read(self):
+        return self.broadcast.read(self)
+
+    def cleanup(self):
+        if not self._unsubscribed:
+            self._unsubscribed = True
+            self._hub._unsubscribe(self.broadcast)
+
+class StreamBroadcastHub:
+    def __init__(self, buffer_frames=250):
+        # 250 frames of 20ms, how long a subscriber can pause without losing its place
+        self.buffer_frames = buffer_frames
+        self._streams = dict()
+        # restarts of shared streams, like Player.stream_stats for streams of one player
+        self.stream_stats = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def subscribe(self, key, source_factory, volume):
+        """
+        Return an AudioSource playing the stream identified by key. The stream is started with
+        source_factory if nobody is playing it yet.
+        """
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if not broadcast or broadcast.ended or broadcast.closed:
+                broadcast = self._streams[key] = StreamBroadcast(key, source_factory, self.buffer_frames)
+            broadcast.subscribers += 1
+            return BroadcastSubscriber(self, broadcast, volume)
+
+    def _unsubscribe(self, broadcast):
+        with self._lock:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers > 0:
+                return
+            if self._streams.get(broadcast.key) is broadcast:
+                del self._streams[broadcast.key]
+        broadcast.close()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'streams': len(self._streams),
+                'subscribers': sum(broadcast.subscribers for broadcast in self._streams.values())
+            }
+
+hub = StreamBroadcastHub()
@@ -6,6 +6,7 @@ import logging
 import configparser
 
 from .exceptions import HelpfulError
+from .utils import parse_size
 from .constants import VERSION as BOTVERSION
 
 log = logging.getLogger(__name__)
@@ -83,6 +84,29 @@ class Config:
         self.help_display_sig = config.getboolean('MusicBot', 'HelpDisplaySig', fallback=ConfigDefaults.help_display_sig)
         self.footer_text = config.get('MusicBot', 'CustomEmbedFooter', fallback=ConfigDefaults.footer_text)
         self.lazy_playlist = config.getboolean('MusicBot', 'LazyPlaylist', fallback = ConfigDefaults.lazy_playlist)
+        self.info_cache_ttl = config.getint('MusicBot', 'InfoCacheTTL', fallback=ConfigDefaults.info_cache_ttl)
+        self.info_cache_size = config.getint('MusicBot', 'InfoCacheSize', fallback=ConfigDefaults.info_cache_size)
+        self.search_cache_ttl = config.getint('MusicBot', 'SearchCacheTTL', fallback=ConfigDefaults.search_cache_ttl)
+        self.search_cache_size = config.getint('MusicBot', 'SearchCacheSize', fallback=ConfigDefaults.search_cache_size)
+        self.spotify_match_max_age = config.getint('MusicBot', 'SpotifyMatchMaxAge', fallback=ConfigDefaults.spotify_match_max_age)
+        self.extractor_threads = config.getint('MusicBot', 'ExtractorThreads', fallback=ConfigDefaults.extractor_threads)
+        self.download_threads = config.getint('MusicBot', 'DownloadThreads', fallback=ConfigDefaults.download_threads)
+        self.extractor_isolation = config.getboolean('MusicBot', 'ExtractorIsolation', fallback=ConfigDefaults.extractor_isolation)
+        self.extractor_timeout = config.getint('MusicBot', 'ExtractorTimeout', fallback=ConfigDefaults.extractor_timeout)
+        self.download_timeout = config.getint('MusicBot', 'DownloadTimeout', fallback=ConfigDefaults.download_timeout)
+        self.extractor_max_jobs = config.getint('MusicBot', 'ExtractorMaxJobs', fallback=ConfigDefaults.extractor_max_jobs)
+        self.storage_limit = config.get('MusicBot', 'StorageLimit', fallback=ConfigDefaults.storage_limit)
+        self.cache_eviction_policy = config.get('MusicBot', 'CacheEvictionPolicy', fallback=ConfigDefaults.cache_eviction_policy)
+        self.precache_depth = config.getint('MusicBot', 'PrecacheDepth', fallback=ConfigDefaults.precache_depth)
+        self.precache_budget = config.get('MusicBot', 'PrecacheBudget', fallback=ConfigDefaults.precache_budget)
+        self.progressive_playback = config.getboolean('MusicBot', 'ProgressivePlayback', fallback=ConfigDefaults.progressive_playback)
+        self.progressive_buffer = config.get('MusicBot', 'ProgressiveBuffer', fallback=ConfigDefaults.progressive_buffer)
+        self.opus_passthrough = config.getboolean('MusicBot', 'OpusPassthrough', fallback=ConfigDefaults.opus_passthrough)
+        self.share_streams = config.getboolean('MusicBot', 'ShareStreams', fallback=ConfigDefaults.share_streams)
+        self.gapless_playback = config.getboolean('MusicBot', 'GaplessPlayback', fallback=ConfigDefaults.gapless_playback)
+        self.playback_buffer = config.getfloat('MusicBot', 'PlaybackBuffer', fallback=ConfigDefaults.playback_buffer)
+        self.stream_stall_timeout = config.getfloat('MusicBot', 'StreamStallTimeout', fallback=ConfigDefaults.stream_stall_timeout)
+        self.stream_restarts = config.getint('MusicBot', 'StreamRestarts', fallback=ConfigDefaults.stream_restarts)
 
         self.debug_level = config.get('MusicBot', 'DebugLevel', fallback=ConfigDefaults.debug_level)
         self.debug_level_str = self.debug_level
@@ -246,6 +270,56 @@ class Config:
         if not self.footer_text:
             self.footer_text = ConfigDefaults.footer_text
 
+        try:
+            self.storage_limit = parse_size(self.storage_limit or 0)
+        except (ValueError, KeyError):
+            log.warning("StorageLimit data \"{}\" is invalid, audio cache size will not be limited".format(self.storage_limit))
+            self.storage_limit = 0
+
+        self.cache_eviction_policy = self.cache_eviction_policy.strip().lower()
+        if self.cache_eviction_policy not in ('lru', 'lfu'):
+            log.warning("Invalid CacheEvictionPolicy \"{}\", falling back to {}".format(self.cache_eviction_policy, ConfigDefaults.cache_eviction_policy))
+            self.cache_eviction_policy = ConfigDefaults.cache_eviction_policy
+
+        try:
+            self.precache_budget = parse_size(self.precache_budget or 0)
+        except (ValueError, KeyError):
+            log.warning("PrecacheBudget data \"{}\" is invalid, lookahead will only be limited by PrecacheDepth".format(self.precache_budget))
+            self.precache_budget = 0
+
+        try:
+            self.progressive_buffer = parse_size(self.progressive_buffer)
+        except (ValueError, KeyError):
+            log.warning("ProgressiveBuffer data \"{}\" is invalid, using {} instead".format(self.progressive_buffer, ConfigDefaults.progressive_buffer))
+            self.progressive_buffer = parse_size(ConfigDefaults.progressive_buffer)
+
+        if self.playback_buffer < 0:
+            log.warning("PlaybackBuffer cannot be negative, using {} instead".format(ConfigDefaults.playback_buffer))
+            self.playback_buffer = ConfigDefaults.playback_buffer
+
+        if self.stream_stall_timeout < 0:
+            log.warning("StreamStallTimeout cannot be negative, using {} instead".format(ConfigDefaults.stream_stall_timeout))
+            self.stream_stall_timeout = ConfigDefaults.stream_stall_timeout
+
+        if self.stream_restarts < 0:
+            log.warning("StreamRestarts cannot be negative, using {} instead".format(ConfigDefaults.stream_restarts))
+            self.stream_restarts = ConfigDefaults.stream_restarts
+
+        if self.opus_passthrough and self.default_volume != 1.0:
+            log.warning("OpusPassthrough only applies to servers playing at volume 1.0, with DefaultVolume {} downloads are not converted to opus".format(self.default_volume))
+
+        if self.precache_depth < 1:
+            log.warning("PrecacheDepth must be at least 1, using {} instead".format(ConfigDefaults.precache_depth))
+            self.precache_depth = ConfigDefaults.precache_depth
+
+        if self.extractor_threads < 1:
+            log.warning("ExtractorThreads must be at least 1, using {} instead".format(ConfigDefaults.extractor_threads))
+            self.extractor_threads = ConfigDefaults.extractor_threads
+
+        if self.download_threads < 1:
+            log.warning("DownloadThreads must be at least 1, using {} instead".format(ConfigDefaults.download_threads))
+            self.download_threads = ConfigDefaults.download_threads
+
     def create_empty_file_ifnoexist(self, path):
         if not os.path.isfile(path):
             open(path, 'a').close()
@@ -384,6 +458,29 @@ class ConfigDefaults:
     help_display_sig = False
     footer_text = 'Just-Some-Bots/MusicBot ({})'.format(BOTVERSION)
     lazy_playlist = True
+    info_cache_ttl = 3600
+    info_cache_size = 2000
+    search_cache_ttl = 1800
+    search_cache_size = 200
+    spotify_match_max_age = 30
+    extractor_threads = 4
+    download_threads = 2
+    extractor_isolation = False
+    extractor_timeout = 60
+    download_timeout = 1800
+    extractor_max_jobs = 50
+    storage_limit = '0'
+    cache_eviction_policy = 'lru'
+    precache_depth = 2
+    precache_budget = '0'
+    progressive_playback = False
+    progressive_buffer = '256K'
+    opus_passthrough = False
+    share_streams = False
+    gapless_playback = True
+    playback_buffer = 2.0
+    stream_stall_timeout = 10.0
+    stream_restarts = 5
 
     options_file = 'config/options.ini'
     blacklist_file = 'config/blacklist.txt'
@@ -0,0 +1,184 @@
+"""
+In-process PCM processing between FFmpeg and the opus encoder.
+
+DSPAudio replaces PCMVolumeTransformer when numpy is available. Every 20ms frame is processed as
+a whole with numpy: volume changes are smoothed over one frame instead of jumping, and fades and
+equalizer bands can be changed while a song plays without restarting FFmpeg.
+
+Biquad filters are recursive, so instead of running them sample by sample they are run on blocks
+of samples in state-space form: the output of a block is a matrix product of the input block
+plus the contribution of the state the previous block left behind, which is exact.
+"""
+
+import math
+import threading
+
+from discord.player import AudioSource
+
+# optionally using numpy for in-process effects if presents
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+available = numpy is not None
+
+SAMPLING_RATE = 48000
+CHANNELS = 2
+FRAME_SAMPLES = 960
+# biquads process a frame in sub-blocks of this many samples, smaller matrices are cheaper
+_BLOCK = 240
+
+EQ_TYPES = ('lowshelf', 'highshelf', 'peak')
+
+def _biquad_coefficients(kind, freq, gain_db, q):
+    # Robert Bristow-Johnson's audio EQ cookbook
+    amp = 10 ** (gain_db / 40)
+    w0 = 2 * math.pi * freq / SAMPLING_RATE
+    cos_w0 = math.cos(w0)
+    alpha = math.sin(w0) / (2 * q)
+
+    if kind == 'peak':
+        b = (1 + alpha * amp, -2 * cos_w0, 1 - alpha * amp)
+        a = (1 + alpha / amp, -2 * cos_w0, 1 - alpha / amp)
+    else:
+        sqrt_amp_alpha = 2 * math.sqrt(amp) * alpha
+        sign = 1 if kind == 'lowshelf' else -1
+        b = (
+            amp * ((amp + 1) - sign * (amp - 1) * cos_w0 + sqrt_amp_alpha),
+            sign * 2 * amp * ((amp - 1) - sign * (amp + 1) * cos_w0),
+            amp * ((amp + 1) - sign * (amp - 1) * cos_w0 - sqrt_amp_alpha)
+        )
+        a = (
+            (amp + 1) + sign * (amp - 1) * cos_w0 + sqrt_amp_alpha,
+            -sign * 2 * ((amp - 1) + sign * (amp + 1) * cos_w0),
+            (amp + 1) + sign * (amp - 1) * cos_w0 - sqrt_amp_alpha
+        )
+
+    return [x / a[0] for x in b], [x / a[0] for x in a]
+
+class Biquad:
+    def __init__(self, kind, freq, gain_db, q=0.707):
+        (b0, b1, b2), (_, a1, a2) = _biquad_coefficients(kind, freq, gain_db, q)
+
+        # transposed direct form II as state-space: s' = A s + B x, y = C s + D x
+        A = numpy.array([[-a1, 1.0], [-a2, 0.0]])
+        B = numpy.array([b1 - a1 * b0, b2 - a2 * b0])
+        C = numpy.array([1.0, 0.0])
+
+        # powers of A: C A^n for the response to the state, A^n B for the impulse response
+        observe = numpy.empty((_BLOCK, 2))
+        impulse = numpy.empty(_BLOCK)
+        feed = numpy.empty((2, _BLOCK))
+        power = numpy.eye(2)
+        impulse[0] = b0
+        for n in range(_BLOCK):
+            observe[n] = C @ power
+            feed[:, _BLOCK - 1 - n] = power @ B
+            if n + 1 < _BLOCK:
+                impulse[n + 1] = C @ power @ B
+            power = A @ power
+
+        idx = numpy.arange(_BLOCK)
+        lag = idx[:, None] - idx[None, :]
+        self._toeplitz = numpy.where(lag >= 0, impulse[numpy.clip(lag, 0, None)], 0.0)
+        self._observe = observe
+        self._feed = feed
+        self._transition = power
+        self._state = numpy.zeros((2, CHANNELS))
+
+    def process(self, samples):
+        out = numpy.empty_like(samples)
+        for start in range(0, len(samples), _BLOCK):
+            block = samples[start:start + _BLOCK]
+            if len(block) < _BLOCK:
+                block = numpy.vstack((block, numpy.zeros((_BLOCK - len(block), CHANNELS))))
+                out[start:] = (self._toeplitz @ block + self._observe @ self._state)[:len(samples) - start]
+                # partial blocks only happen at the very end
+                break
+            out[start:start + _BLOCK] = self._toeplitz @ block + self._observe @ self._state
+            self._state = self._transition @ self._state + self._feed @ block
+        return out
+
+class DSPAudio(AudioSource):
+    """
+    Apply volume and effects to a PCM AudioSource. effects is a list of tuples as kept in
+    Player.dsp_effects, total_frames is the length of the song in frames if known (fade out needs it)
+    and start_frame is where in the song original starts.
+    """
+    def __init__(self, original, volume=1.0, effects=(), total_frames=None, start_frame=0):
+        self.original = original
+        self._volume = volume
+        # gain at the end of the last frame, volume changes ramp from it
+        self._gain = volume
+        self.frames = start_frame
+        self.total_frames = total_frames
+        self._lock = threading.Lock()
+        self._fades = []
+        self._filters = []
+        self.set_effects(effects)
+
+    @property
+    def volume(self):
+        return self._volume
+
+    @volume.setter
+    def volume(self, value):
+        self._volume = max(value, 0.0)
+
+    def set_effects(self, effects):
+        """
+        Replace the effects, taking effect from the next frame. Can be called from any thread.
+        """
+        fades = []
+        filters = []
+        for effect in effects:
+            if effect[0] in ('fadein', 'fadeout'):
+                fades.append((effect[0], max(int(effect[1] * SAMPLING_RATE), 1)))
+            elif effect[0] == 'eq':
+                filters.append(Biquad(*effect[1:]))
+        with self._lock:
+            self._fades = fades
+            self._filters = filters
+
+    def _fade_envelope(self):
+        first = self.frames * FRAME_SAMPLES
+        position = numpy.arange(first, first + FRAME_SAMPLES)
+        envelope = numpy.ones(FRAME_SAMPLES)
+        for kind, length in self._fades:
+            if kind == 'fadein':
+                if first < length:
+                    envelope *= numpy.clip(position / length, 0.0, 1.0)
+            elif self.total_frames:
+                remaining = self.total_frames * FRAME_SAMPLES - position
+                if remaining[0] < length:
+                    envelope *= numpy.clip(remaining / length, 0.0, 1.0)
+        return envelope
+
+    def read(self):
+        data = self.original.read()
+        if not data:
+            return data
+
+        samples = numpy.frombuffer(data, dtype=numpy.int16).reshape(-1, CHANNELS).astype(numpy.float64)
+
+        with self._lock:
+            for biquad in self._filters:
+                samples = biquad.process(samples)
+            fading = bool(self._fades)
+
+        target = min(self._volume, 2.0)
+        if target != self._gain:
+            gain = numpy.linspace(self._gain, target, len(samples), endpoint=False) + (target - self._gain) / len(samples)
+            self._gain = target
+        else:
+            gain = numpy.full(len(samples), target)
+        if fading and len(samples) == FRAME_SAMPLES:
+            gain = gain * self._fade_envelope()
+        samples *= gain[:, None]
+
+        self.frames += 1
+        return numpy.clip(samples, -32768, 32767).astype(numpy.int16).tobytes()
+
+    def cleanup(self):
+        self.original.cleanup()
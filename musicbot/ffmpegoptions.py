@@ -1,53 +1,106 @@
 import re
+import math
+import asyncio
 
-from .utils import get_command, run_command
+from .utils import get_command
 
-async def get_equalize_option(filename, log):
+_loudnorm_target = 'I=-24.0:LRA=7.0:TP=-2.0:linear=true'
+
+# measurement name -> key in the json printed by loudnorm
+_loudness_keys = (
+    ('I', 'input_i'),
+    ('LRA', 'input_lra'),
+    ('TP', 'input_tp'),
+    ('thresh', 'input_thresh'),
+    ('offset', 'target_offset')
+)
+
+async def measure_loudness(filename, log):
+    """
+    Run FFmpeg loudnorm analysis pass over the whole file and return dict of its measurements,
+    or None if FFmpeg failed or did not print all of them. Silent files, which loudnorm
+    measures as -inf, give {'silent': True} so that they are not normalized nor measured again.
+    This decodes the whole file, so it should be done ahead of playing.
+    """
     log.debug('Calculating mean volume of {0}'.format(filename))
-    cmd = '"' + get_command('ffmpeg') + '" -i "' + filename + '" -af loudnorm=I=-24.0:LRA=7.0:TP=-2.0:linear=true:print_format=json -f null /dev/null'
-    output = await run_command(cmd, log)
-    output = output.decode("utf-8")
+    p = await asyncio.create_subprocess_exec(
+        get_command('ffmpeg'),
+        '-nostdin',
+        '-i', filename,
+        '-af', 'loudnorm={}:print_format=json'.format(_loudnorm_target),
+        '-f', 'null', '-',
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, output = await p.communicate()
+    output = output.decode("utf-8", errors='replace')
     log.debug(output)
-    # print('----', output)
-
-    I_matches = re.findall(r'"input_i" : "([-]?([0-9]*\.[0-9]+))",', output)
-    if (I_matches):
-        log.debug('I_matches={}'.format(I_matches[0][0]))
-        I = float(I_matches[0][0])
-    else:
-        log.debug('Could not parse I in normalise json.')
-        I = float(0)
-
-    LRA_matches = re.findall(r'"input_lra" : "([-]?([0-9]*\.[0-9]+))",', output)
-    if (LRA_matches):
-        log.debug('LRA_matches={}'.format(LRA_matches[0][0]))
-        LRA = float(LRA_matches[0][0])
-    else:
-        log.debug('Could not parse LRA in normalise json.')
-        LRA = float(0)
-
-    TP_matches = re.findall(r'"input_tp" : "([-]?([0-9]*\.[0-9]+))",', output)
-    if (TP_matches):
-        log.debug('TP_matches={}'.format(TP_matches[0][0]))
-        TP = float(TP_matches[0][0])
-    else:
-        log.debug('Could not parse TP in normalise json.')
-        TP = float(0)
-
-    thresh_matches = re.findall(r'"input_thresh" : "([-]?([0-9]*\.[0-9]+))",', output)
-    if (thresh_matches):
-        log.debug('thresh_matches={}'.format(thresh_matches[0][0]))
-        thresh = float(thresh_matches[0][0])
-    else:
-        log.debug('Could not parse thresh in normalise json.')
-        thresh = float(0)
-
-    offset_matches = re.findall(r'"target_offset" : "([-]?([0-9]*\.[0-9]+))', output)
-    if (offset_matches):
-        log.debug('offset_matches={}'.format(offset_matches[0][0]))
-        offset = float(offset_matches[0][0])
-    else:
-        log.debug('Could not parse offset in normalise json.')
-        offset = float(0)
-
-    return ' -af loudnorm=I=-24.0:LRA=7.0:TP=-2.0:linear=true:measured_I={}:measured_LRA={}:measured_TP={}:measured_thresh={}:offset={}'.format(I, LRA, TP, thresh, offset)
\ No newline at end of file
+
+    if p.returncode != 0:
+        log.debug('FFmpeg exited with {} while measuring loudness of {}'.format(p.returncode, filename))
+        return None
+
+    measurements = dict()
+    for name, key in _loudness_keys:
+        matches = re.findall(r'"{}" : "([-+]?(?:[0-9]*\.[0-9]+|inf))"'.format(key), output)
+        if matches:
+            log.debug('{}_matches={}'.format(name, matches[0]))
+            measurements[name] = float(matches[0])
+        else:
+            log.debug('Could not parse {} in normalise json.'.format(name))
+            return None
+
+    if not all(math.isfinite(value) for value in measurements.values()):
+        log.debug('{} is silent, it will not be normalized'.format(filename))
+        return {'silent': True}
+
+    return measurements
+
+async def transcode_to_opus(filename, destination, log):
+    """
+    Convert the audio of a file to opus in 20ms frames, which is what Discord expects.
+    Return whether it succeeded.
+    """
+    log.debug('Converting {} to opus'.format(filename))
+    p = await asyncio.create_subprocess_exec(
+        get_command('ffmpeg'),
+        '-nostdin',
+        '-y',
+        '-i', filename,
+        '-vn',
+        '-c:a', 'libopus',
+        '-b:a', '128k',
+        '-frame_duration', '20',
+        '-ar', '48000',
+        '-ac', '2',
+        '-f', 'ogg',
+        destination,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, output = await p.communicate()
+    if p.returncode != 0:
+        log.warning('Could not convert {} to opus: {}'.format(filename, output.decode('utf-8', errors='replace')[-500:]))
+        return False
+    return True
+
+def get_equalize_option(measurements=None):
+    """
+    FFmpeg options normalizing loudness. Without measurements loudnorm works in its single pass
+    dynamic mode, which does not need to look at the file beforehand. Silent files are left as
+    they are, loudnorm would only amplify their noise.
+    """
+    if not measurements:
+        return ' -af loudnorm={}'.format(_loudnorm_target)
+
+    if measurements.get('silent'):
+        return ''
+
+    return ' -af loudnorm={}:measured_I={}:measured_LRA={}:measured_TP={}:measured_thresh={}:offset={}'.format(
+        _loudnorm_target,
+        measurements['I'],
+        measurements['LRA'],
+        measurements['TP'],
+        measurements['thresh'],
+        measurements['offset']
+    )
@@ -3,12 +3,18 @@ from . import exceptions
 
 class GuildConfig(Serializable):
     def __init__(self, bot):
+        self._bot = bot
         self.auto_random = False
+        # None means following PrecacheDepth and PrecacheBudget in the options file
+        self.precache_depth = None
+        self.precache_budget = None
 
     def __json__(self):
         return self._enclose_json({
-            'version': 3,
-            'auto_random': self.auto_random
+            'version': 4,
+            'auto_random': self.auto_random,
+            'precache_depth': self.precache_depth,
+            'precache_budget': self.precache_budget
         })
 
     @classmethod
@@ -23,4 +29,16 @@ class GuildConfig(Serializable):
         if 'version' not in data or data['version'] >= 2:
             config.auto_random = data['auto_random']
 
-        return config
\ No newline at end of file
+        if data['version'] >= 4:
+            config.precache_depth = data.get('precache_depth')
+            config.precache_budget = data.get('precache_budget')
+
+        return config
+
+    def get_precache(self):
+        """
+        Return (depth, budget) of lookahead precaching for this guild.
+        """
+        depth = self.precache_depth if self.precache_depth is not None else self._bot.config.precache_depth
+        budget = self.precache_budget if self.precache_budget is not None else self._bot.config.precache_budget
+        return (depth, budget)
\ No newline at end of file
@@ -0,0 +1,256 @@
+import os
+import re
+import json
+import time
+import logging
+from copy import deepcopy
+from datetime import datetime, timezone
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+log = logging.getLogger(__name__)
+
+# fields of an info dict that are actually read somewhere in the bot, everything else
+# youtube_dl return (formats, thumbnails, http headers, ...) is dropped before caching
+_info_fields = (
+    '_type', 'id', 'title', 'url', 'webpage_url', 'extractor', 'extractor_key', 'ie_key',
+    'duration', 'is_live', 'ext', 'description'
+)
+
+def normalize_url(url):
+    """
+    Normalize url so that trivially different spelling of the same url share cache entry.
+    Non-url strings (search queries etc.) are only stripped.
+    """
+    url = url.strip().strip('<>')
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+
+    if parts.scheme.lower() not in ('http', 'https') or not parts.netloc:
+        return url
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+_expire_path_re = re.compile(r'/expire/(\d+)')
+
+# cached info whose media url expires sooner than this is extracted again
+_expiry_margin = 600
+
+def url_expiry(url):
+    """
+    Unix time a signed media url (googlevideo, CloudFront, S3 and alike) stops working.
+    Return None if the url does not tell.
+    """
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+
+    query = dict(parse_qsl(parts.query))
+    try:
+        for name in ('expire', 'Expires', 'expires'):
+            if name in query:
+                return int(float(query[name]))
+        if 'X-Amz-Date' in query and 'X-Amz-Expires' in query:
+            signed = datetime.strptime(query['X-Amz-Date'], '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+            return int(signed.timestamp()) + int(query['X-Amz-Expires'])
+    except ValueError:
+        return None
+
+    # googlevideo manifest urls have their parameters in the path
+    match = _expire_path_re.search(parts.path)
+    if match:
+        return int(match.group(1))
+    return None
+
+_search_re = re.compile(r'^(?P<service>[a-z]+search)(?P<n>\d*):(?P<query>.+)$', re.DOTALL)
+
+def parse_search(query):
+    """
+    Split youtube_dl search query such as ytsearch3:something into (service, number of results, query).
+    Return None if it is not a search query. Query is normalized so that case and spacing does not matter.
+    """
+    match = _search_re.match(query.strip())
+    if not match:
+        return None
+    return (match.group('service'), int(match.group('n') or 1), ' '.join(match.group('query').casefold().split()))
+
+def trim_info(info):
+    """
+    Return a copy of info containing only fields used by the bot.
+    Return None if info cannot be cached (i.e. contains lazily evaluated entries).
+    """
+    trimmed = {k: info[k] for k in _info_fields if k in info}
+    if 'entries' in info:
+        if not isinstance(info['entries'], list):
+            return None
+        trimmed['entries'] = [
+            {k: e[k] for k in _info_fields if k in e} if e else None for e in info['entries']
+        ]
+    return trimmed
+
+class InfoCache:
+    def __init__(self, path, ttl, size):
+        self.path = path
+        self.ttl = ttl
+        self.size = size
+        self._cache = OrderedDict()
+        self._save_handle = None
+
+        if self.enabled:
+            self.load()
+
+    @property
+    def enabled(self):
+        return self.size > 0 and self.ttl > 0
+
+    @staticmethod
+    def key(url, process):
+        return '{}|{}'.format('process' if process else 'noprocess', normalize_url(url))
+
+    def load(self):
+        if not os.path.isfile(self.path):
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf8') as f:
+                data = json.load(f)
+        except Exception:
+            log.warning('Could not load extraction info cache from {}, starting with empty cache'.format(self.path), exc_info=True)
+            return
+
+        now = time.time()
+        # file is saved in LRU order so just insert them back in order
+        for key, item in data:
+            if now - item['time'] < self.ttl:
+                self._cache[key] = item
+        self._evict()
+        log.debug('Loaded {} cached extraction info'.format(len(self._cache)))
+
+    def save(self):
+        self._save_handle = None
+        if not self.enabled:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            with open(self.path, 'w', encoding='utf8') as f:
+                json.dump(list(self._cache.items()), f)
+        except Exception:
+            log.warning('Could not save extraction info cache to {}'.format(self.path), exc_info=True)
+
+    def schedule_save(self, loop, delay=60):
+        if not self._save_handle:
+            self._save_handle = loop.call_later(delay, self.save)
+
+    def get(self, url, process):
+        if not self.enabled:
+            return None
+
+        key = self.key(url, process)
+        item = self._cache.get(key)
+        if not item:
+            return None
+
+        if time.time() - item['time'] >= self.ttl:
+            del self._cache[key]
+            return None
+
+        expiry = url_expiry(item['info'].get('url') or '')
+        if expiry is not None and expiry - time.time() < _expiry_margin:
+            del self._cache[key]
+            return None
+
+        self._cache.move_to_end(key)
+        # callers add to what they get, which must not end up in the cache
+        return deepcopy(item['info'])
+
+    def put(self, url, process, info):
+        if not self.enabled or not info:
+            return False
+
+        # live streams' media url expire fast, not worth caching
+        if info.get('is_live'):
+            return False
+
+        trimmed = trim_info(info)
+        if trimmed is None:
+            return False
+
+        key = self.key(url, process)
+        self._cache[key] = {'time': time.time(), 'info': trimmed}
+        self._cache.move_to_end(key)
+        self._evict()
+        return True
+
+    def _evict(self):
+        while len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        self._cache.clear()
+
+class SearchCache:
+    """
+    In-memory cache of search results. A cached search with more results also answers
+    the same search asking for fewer results.
+    """
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        self._cache = OrderedDict()
+
+    @property
+    def enabled(self):
+        return self.size > 0 and self.ttl > 0
+
+    def get(self, query):
+        search = parse_search(query)
+        if not self.enabled or not search:
+            return None
+
+        service, n, text = search
+        key = (service, text)
+        item = self._cache.get(key)
+        if not item:
+            return None
+
+        if time.time() - item['time'] >= self.ttl:
+            del self._cache[key]
+            return None
+
+        if item['n'] < n:
+            return None
+
+        self._cache.move_to_end(key)
+        info = deepcopy(item['info'])
+        info['entries'] = info['entries'][:n]
+        return info
+
+    def put(self, query, info):
+        search = parse_search(query)
+        if not self.enabled or not search or not info:
+            return False
+
+        trimmed = trim_info(info)
+        if trimmed is None or 'entries' not in trimmed:
+            return False
+
+        service, n, text = search
+        key = (service, text)
+        item = self._cache.get(key)
+        if item and item['n'] > n and time.time() - item['time'] < self.ttl:
+            # already have a bigger result
+            return False
+
+        self._cache[key] = {'time': time.time(), 'n': n, 'info': trimmed}
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+        return True
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,258 @@
+"""
+Read the duration of an audio file from its container headers, without decoding anything.
+Supports the containers youtube_dl usually produces: WebM/Matroska, MP4/M4A, Ogg (Opus, Vorbis)
+and MP3. Only the headers are read (and the last page for Ogg), through small buffered reads.
+These functions block, run them in an executor.
+"""
+
+import os
+import struct
+
+def get_duration(path):
+    """
+    Return duration of the file in seconds, or None if it cannot be determined.
+    """
+    try:
+        with open(path, 'rb') as f:
+            magic = f.read(12)
+            f.seek(0)
+            if magic.startswith(b'\x1a\x45\xdf\xa3'):
+                return _matroska_duration(f)
+            if magic[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide'):
+                return _mp4_duration(f)
+            if magic.startswith(b'OggS'):
+                return _ogg_duration(f)
+            if magic.startswith(b'ID3') or (len(magic) > 1 and magic[0] == 0xff and magic[1] & 0xe0 == 0xe0):
+                return _mp3_duration(f)
+    except (OSError, struct.error, ValueError, IndexError):
+        pass
+    return None
+
+def _file_size(f):
+    return os.fstat(f.fileno()).st_size
+
+# Matroska
+
+_EBML_SEGMENT = 0x18538067
+_EBML_INFO = 0x1549a966
+_EBML_TIMECODE_SCALE = 0x2ad7b1
+_EBML_DURATION = 0x4489
+
+def _read_vint(f, keep_marker):
+    first = f.read(1)
+    if not first:
+        raise ValueError('unexpected end of file')
+    first = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8:
+        raise ValueError('invalid vint')
+    value = first if keep_marker else first & (mask - 1)
+    unknown = not keep_marker and value == mask - 1
+    for byte in f.read(length - 1):
+        value = (value << 8) | byte
+        unknown = unknown and byte == 0xff
+    return value, (None if unknown else value)
+
+def _read_element_header(f):
+    element_id, _ = _read_vint(f, True)
+    _, size = _read_vint(f, False)
+    return element_id, size
+
+def _matroska_duration(f):
+    end = _file_size(f)
+    while f.tell() < end:
+        element_id, size = _read_element_header(f)
+        if element_id == _EBML_SEGMENT:
+            # descend, segment size might be unknown when written by a live muxer
+            segment_end = end if size is None else min(end, f.tell() + size)
+            while f.tell() < segment_end:
+                element_id, size = _read_element_header(f)
+                if size is None:
+                    return None
+                if element_id == _EBML_INFO:
+                    return _matroska_info_duration(f, f.tell() + size)
+                f.seek(size, os.SEEK_CUR)
+            return None
+        if size is None:
+            return None
+        f.seek(size, os.SEEK_CUR)
+    return None
+
+def _matroska_info_duration(f, info_end):
+    scale = 1000000
+    duration = None
+    while f.tell() < info_end:
+        element_id, size = _read_element_header(f)
+        if size is None:
+            return None
+        data = f.read(size)
+        if element_id == _EBML_TIMECODE_SCALE:
+            scale = int.from_bytes(data, 'big')
+        elif element_id == _EBML_DURATION:
+            duration = struct.unpack('>f' if size == 4 else '>d', data)[0]
+    if duration is None:
+        return None
+    return duration * scale / 1e9
+
+# MP4
+
+def _mp4_boxes(f, end):
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+        elif size == 0:
+            size = end - start
+        if size < 8:
+            return
+        yield box_type, start + size
+        f.seek(start + size)
+
+def _mp4_duration(f):
+    end = _file_size(f)
+    sidx_duration = None
+    for box_type, box_end in _mp4_boxes(f, end):
+        if box_type == b'moov':
+            duration = _mp4_moov_duration(f, box_end)
+            if duration:
+                return duration
+        elif box_type == b'sidx' and sidx_duration is None:
+            sidx_duration = _mp4_sidx_duration(f)
+    # fragmented files (youtube DASH audio) might only have their duration in the segment index
+    return sidx_duration
+
+def _mp4_moov_duration(f, moov_end):
+    timescale = None
+    fragment_length = None
+    for box_type, box_end in _mp4_boxes(f, moov_end):
+        if box_type == b'mvhd':
+            version = f.read(4)[0]
+            if version == 1:
+                timescale, length = struct.unpack('>IQ', f.read(28)[16:])
+            else:
+                timescale, length = struct.unpack('>II', f.read(16)[8:])
+            if timescale and length and length not in (0xffffffff, 0xffffffffffffffff):
+                return length / timescale
+        elif box_type == b'mvex':
+            for sub_type, _ in _mp4_boxes(f, box_end):
+                if sub_type == b'mehd':
+                    version = f.read(4)[0]
+                    fragment_length = struct.unpack('>Q' if version == 1 else '>I', f.read(8 if version == 1 else 4))[0]
+    if timescale and fragment_length:
+        return fragment_length / timescale
+    return None
+
+def _mp4_sidx_duration(f):
+    version = f.read(4)[0]
+    _, timescale = struct.unpack('>II', f.read(8))
+    f.read(16 if version == 1 else 8)
+    _, count = struct.unpack('>HH', f.read(4))
+    total = 0
+    for _ in range(count):
+        _, subsegment_duration, _ = struct.unpack('>III', f.read(12))
+        total += subsegment_duration
+    return total / timescale if timescale and total else None
+
+# Ogg
+
+_OGG_TAIL = 65536
+
+def _ogg_duration(f):
+    header = f.read(27)
+    segments = f.read(header[26])
+    packet = f.read(sum(segments))
+
+    if packet.startswith(b'OpusHead'):
+        pre_skip = struct.unpack('<H', packet[10:12])[0]
+        rate = 48000
+    elif packet.startswith(b'\x01vorbis'):
+        pre_skip = 0
+        rate = struct.unpack('<I', packet[12:16])[0]
+    else:
+        return None
+
+    size = _file_size(f)
+    f.seek(max(0, size - _OGG_TAIL))
+    tail = f.read()
+    pos = tail.rfind(b'OggS')
+    while pos != -1:
+        granule = struct.unpack('<q', tail[pos + 6:pos + 14])[0]
+        if granule >= 0:
+            return max(granule - pre_skip, 0) / rate
+        pos = tail.rfind(b'OggS', 0, pos)
+    return None
+
+# MP3
+
+_MP3_BITRATES = {
+    # (mpeg version 1, layer) -> kbps by index
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+def _mp3_duration(f):
+    start = 0
+    header = f.read(10)
+    if header.startswith(b'ID3'):
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        start = 10 + size + (10 if header[5] & 0x10 else 0)
+
+    f.seek(start)
+    data = f.read(4096)
+    pos = 0
+    while pos + 4 <= len(data):
+        if data[pos] == 0xff and data[pos + 1] & 0xe0 == 0xe0:
+            break
+        pos += 1
+    else:
+        return None
+
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version = (b1 >> 3) & 0x3
+    layer = 4 - ((b1 >> 1) & 0x3)
+    if version == 1 or layer == 4:
+        return None
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][(b2 >> 4) & 0xf] * 1000
+    rate = _MP3_SAMPLE_RATES[version][(b2 >> 2) & 0x3]
+    mono = (b3 >> 6) == 3
+
+    if layer == 1:
+        samples = 384
+    elif layer == 3 and not mpeg1:
+        samples = 576
+    else:
+        samples = 1152
+
+    # VBR files tell the number of frames in a Xing/Info or VBRI header in the first frame
+    xing = pos + 4 + ((17 if mono else 32) if mpeg1 else (9 if mono else 17))
+    frames = None
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+        if flags & 0x1:
+            frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+    elif data[pos + 36:pos + 40] == b'VBRI':
+        frames = struct.unpack('>I', data[pos + 50:pos + 54])[0]
+
+    if frames:
+        return frames * samples / rate
+
+    if not bitrate:
+        return None
+    audio_size = _file_size(f) - start - pos
+    # ID3v1 tag at the end
+    f.seek(-128, os.SEEK_END)
+    if f.read(3) == b'TAG':
+        audio_size -= 128
+    return audio_size * 8 / bitrate
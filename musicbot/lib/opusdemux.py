@@ -0,0 +1,194 @@
+"""
+Read raw Opus packets out of WebM/Matroska and Ogg files without decoding them, so they can be
+sent to Discord as-is. Everything here blocks on file reads.
+"""
+
+import struct
+
+from .mediaduration import _read_element_header
+
+_EBML_SEGMENT = 0x18538067
+_EBML_CLUSTER = 0x1f43b675
+_EBML_TRACKS = 0x1654ae6b
+_EBML_TRACK_ENTRY = 0xae
+_EBML_TRACK_NUMBER = 0xd7
+_EBML_CODEC_ID = 0x86
+_EBML_BLOCK_GROUP = 0xa0
+_EBML_BLOCK = 0xa1
+_EBML_SIMPLE_BLOCK = 0xa3
+
+# elements whose children we walk into without caring about their size
+_EBML_MASTERS = {_EBML_SEGMENT, _EBML_CLUSTER, _EBML_TRACKS, _EBML_BLOCK_GROUP}
+
+_EBML_INTERESTING = {_EBML_TRACK_NUMBER, _EBML_CODEC_ID, _EBML_SIMPLE_BLOCK, _EBML_BLOCK}
+
+# samples at 48kHz of one frame for every opus configuration number, see RFC 6716 section 3.1
+_FRAME_SAMPLES = (
+    [480, 960, 1920, 2880] * 3 +
+    [480, 960] * 2 +
+    [120, 240, 480, 960] * 4
+)
+
+def packet_samples(packet):
+    """
+    Number of samples at 48kHz in an opus packet.
+    """
+    toc = packet[0]
+    frame = _FRAME_SAMPLES[toc >> 3]
+    code = toc & 0x3
+    if code == 0:
+        return frame
+    if code in (1, 2):
+        return frame * 2
+    if len(packet) < 2:
+        return 0
+    return frame * (packet[1] & 0x3f)
+
+def is_opus_file(path):
+    """
+    Return True if the file is WebM/Matroska or Ogg containing opus audio.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return next(opus_packets(f), None) is not None
+    except (OSError, ValueError, struct.error, IndexError):
+        return False
+
+def opus_packets(f):
+    """
+    Generate opus packets of the file object, nothing if the file is not opus in WebM or Ogg.
+    """
+    magic = f.read(4)
+    f.seek(0)
+    if magic == b'\x1a\x45\xdf\xa3':
+        return _webm_packets(f)
+    if magic == b'OggS':
+        return _ogg_packets(f)
+    return iter(())
+
+def _webm_packets(f):
+    opus_track = None
+    track_number = None
+    codec_id = None
+
+    while True:
+        try:
+            element_id, size = _read_element_header(f)
+        except ValueError:
+            # end of file
+            return
+
+        if element_id in _EBML_MASTERS:
+            continue
+
+        if element_id == _EBML_TRACK_ENTRY:
+            # track entry ends where its size says, remember what was read from the previous one
+            if codec_id == b'A_OPUS' and opus_track is None:
+                opus_track = track_number
+            track_number = None
+            codec_id = None
+            continue
+
+        if size is None:
+            return
+        if element_id not in _EBML_INTERESTING:
+            f.seek(size, 1)
+            continue
+        data = f.read(size)
+        if len(data) < size:
+            return
+
+        if element_id == _EBML_TRACK_NUMBER:
+            track_number = int.from_bytes(data, 'big')
+        elif element_id == _EBML_CODEC_ID:
+            codec_id = data.rstrip(b'\x00')
+        elif element_id in (_EBML_SIMPLE_BLOCK, _EBML_BLOCK):
+            if opus_track is None:
+                if codec_id != b'A_OPUS':
+                    return
+                opus_track = track_number
+            yield from _webm_block_frames(data, opus_track)
+
+def _block_vint(data, pos, keep_marker=False):
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    return value, pos + length
+
+def _webm_block_frames(data, opus_track):
+    track, pos = _block_vint(data, 0)
+    if track != opus_track:
+        return
+    # skip timecode
+    pos += 2
+    flags = data[pos]
+    pos += 1
+    lacing = (flags >> 1) & 0x3
+
+    if lacing == 0:
+        yield data[pos:]
+        return
+
+    count = data[pos] + 1
+    pos += 1
+    sizes = []
+    if lacing == 1:
+        # xiph lacing
+        for _ in range(count - 1):
+            size = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                size += byte
+                if byte != 255:
+                    break
+            sizes.append(size)
+    elif lacing == 3:
+        # ebml lacing, sizes after the first are signed differences
+        size, pos = _block_vint(data, pos)
+        sizes.append(size)
+        for _ in range(count - 2):
+            start = pos
+            diff, pos = _block_vint(data, pos)
+            length = pos - start
+            diff -= (1 << (7 * length - 1)) - 1
+            size += diff
+            sizes.append(size)
+    else:
+        # fixed size lacing
+        sizes = [(len(data) - pos) // count] * (count - 1)
+
+    sizes.append(len(data) - pos - sum(sizes))
+    for size in sizes:
+        yield data[pos:pos + size]
+        pos += size
+
+def _ogg_packets(f):
+    packet = b''
+    skipped = 0
+    while True:
+        header = f.read(27)
+        if len(header) < 27 or header[:4] != b'OggS':
+            return
+        segments = f.read(header[26])
+        body = f.read(sum(segments))
+
+        pos = 0
+        for lace in segments:
+            packet += body[pos:pos + lace]
+            pos += lace
+            if lace < 255:
+                # first two packets are OpusHead and OpusTags
+                if skipped < 2:
+                    if skipped == 0 and not packet.startswith(b'OpusHead'):
+                        return
+                    skipped += 1
+                elif packet:
+                    yield packet
+                packet = b''
@@ -11,10 +11,10 @@ class BaseEB:
         '''
         get entry (or entries) for given url
         return tuple of length 2 or None
-        first value represents expected number of entries
+        first value represents expected number of entries, or None if unknown
         # IF PY35 DEPRECATED
         # second value is an async iterable that yield entries/Nones
-        second value is an awaitable returning list containing 
+        second value is an awaitable returning list (or async iterable) containing 
         1. awaitables each returning an entry or 
         2. None
         # END IF DEPRECATED
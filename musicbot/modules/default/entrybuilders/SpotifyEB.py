@@ -3,19 +3,89 @@ from .YtdlEB import YtdlEB
 
 import itertools
 import re
+from asyncio import ensure_future
+
+from youtube_dl.utils import DownloadError, ExtractorError
+
+from ....ytdldownloader import get_unprocessed_entry
 
 from .... import messagemanager
 from .... import exceptions
 
+def _unavailable(e):
+    """
+    Whether extracting a video failed because youtube_dl found it removed or unavailable, rather than
+    because of the network or rate limiting, which are reported as errors youtube_dl did not expect.
+    """
+    if not isinstance(e, DownloadError) or not e.exc_info:
+        return False
+    error = e.exc_info[1]
+    return isinstance(error, ExtractorError) and error.expected and not isinstance(error.cause, OSError)
+
 class SpotifyEB(BaseEB):
     @classmethod
-    async def _get_entry_iterator(cls, ctx, url_iterable):
-        for url in url_iterable:
-            ctx.bot.log.debug('Processing {0}'.format(url))
-            # IF PY35 DEPRECATED
-            # return (await YtdlEB.get_entry(ctx, url))[1]
-            return await (await YtdlEB.get_entry(ctx, url))[1]
-            # END IF DEPRECATED
+    async def _get_entry_iterator(cls, ctx, tracks):
+        # IF PY35 DEPRECATED
+        # for track, query in tracks:
+        #     yield await cls._get_track_entry(ctx, track, query)
+        # END IF DEPRECATED
+        matches = ctx.bot.spotify_matches.lookup([track['id'] for track, _ in tracks if track.get('id')])
+        return [cls._get_track_entry(ctx, track, query, matches.get(track.get('id'))) for track, query in tracks]
+
+    @classmethod
+    async def _get_track_entry(cls, ctx, track, query, match):
+        track_id = track.get('id')
+        store = ctx.bot.spotify_matches
+
+        if match:
+            ctx.bot.log.debug('Using known match {0} for {1}'.format(match['url'], query))
+            entry = await get_unprocessed_entry(match['url'], ctx.author.id, ctx.bot.downloader, {'channel_id':ctx.channel.id})
+            entry.title = match['title'] or entry.title
+            entry.duration = match['duration']
+            if store.is_stale(match) and track_id not in store.revalidating:
+                ensure_future(cls._revalidate(ctx, track_id, query, match))
+            return entry
+
+        ctx.bot.log.debug('Processing {0}'.format(query))
+        entry = await (await (await YtdlEB.get_entry(ctx, query))[1])[0]
+        if entry and track_id:
+            store.put(track_id, entry.source_url, entry.title, entry.duration)
+            store.schedule_save(ctx.bot.loop)
+        return entry
+
+    @classmethod
+    async def _revalidate(cls, ctx, track_id, query, match):
+        store = ctx.bot.spotify_matches
+        store.revalidating.add(track_id)
+        try:
+            try:
+                info = await ctx.bot.downloader.extract_info(match['url'], download=False, process=False)
+            except Exception as e:
+                if not _unavailable(e):
+                    # keep the match stale, it gets revalidated again the next time it is used
+                    ctx.bot.log.debug('Could not revalidate Spotify match {0}: {1}'.format(match['url'], e))
+                    store.stats['revalidate_failed'] += 1
+                    return
+                info = None
+
+            if info:
+                store.refresh(track_id)
+                store.stats['revalidated'] += 1
+            else:
+                # video got removed or made unavailable, look for another one
+                try:
+                    results = await ctx.bot.downloader.extract_info('ytsearch:{}'.format(query), download=False)
+                    result = results['entries'][0]
+                    store.put(track_id, result['webpage_url'], result.get('title'), result.get('duration'))
+                    store.stats['replaced'] += 1
+                except Exception:
+                    ctx.bot.log.info('Could not find a replacement for stale Spotify match {0}'.format(match['url']))
+                    store.remove(track_id)
+                    store.stats['dropped'] += 1
+
+            store.schedule_save(ctx.bot.loop)
+        finally:
+            store.revalidating.discard(track_id)
 
     @classmethod
     async def suitable(cls, ctx, url):
@@ -44,19 +114,19 @@ class SpotifyEB(BaseEB):
                         1,
                         SpotifyEB._get_entry_iterator(
                             ctx,
-                            (res['artists'][0]['name'] + ' ' + res['name'], )
+                            [(res, res['artists'][0]['name'] + ' ' + res['name'])]
                         )
                     )
 
                 elif 'album' in parts:
-                    res = await ctx.bot.spotify.get_album(parts[-1])
+                    tracks = await ctx.bot.spotify.get_album_tracks(parts[-1])
                     # procmesg = await messagemanager.safe_send_normal(ctx, ctx, ctx.bot.str.get('cmd-play-spotify-album-process', 'Processing album `{0}` (`{1}`)').format(res['name'], song_url))
                                   
                     return (
-                        len(res['tracks']['items']),
+                        len(tracks),
                         SpotifyEB._get_entry_iterator(
                             ctx,
-                            (i['name'] + ' ' + i['artists'][0]['name'] for i in res['tracks']['items'])
+                            [(i, i['name'] + ' ' + i['artists'][0]['name']) for i in tracks]
                         )
                     )                    
 
@@ -64,22 +134,15 @@ class SpotifyEB(BaseEB):
                     # await messagemanager.safe_send_normal(ctx, ctx, ctx.bot.str.get('cmd-play-spotify-album-queued', "Enqueued `{0}` with **{1}** songs.").format(res['name'], len(res['tracks']['items'])))
 
                 elif 'playlist' in parts:
-                    res = []
-                    r = await ctx.bot.spotify.get_playlist_tracks(parts[-1])
-                    while True:
-                        res.extend(r['items'])
-                        if r['next'] is not None:
-                            r = await ctx.bot.spotify.make_spotify_req(r['next'])
-                            continue
-                        else:
-                            break
+                    # tracks removed from Spotify are given as null
+                    res = [i for i in await ctx.bot.spotify.get_all_playlist_tracks(parts[-1]) if i['track']]
                     # procmesg = await messagemanager.safe_send_normal(ctx, ctx, ctx.bot.str.get('cmd-play-spotify-playlist-process', 'Processing playlist `{0}` (`{1}`)').format(parts[-1], song_url))
                     
                     return (
                         len(res),
                         SpotifyEB._get_entry_iterator(
                             ctx,
-                            (i['track']['name'] + ' ' + i['track']['artists'][0]['name'] for i in res)
+                            [(i['track'], i['track']['name'] + ' ' + i['track']['artists'][0]['name']) for i in res]
                         )
                     )
                     
@@ -3,16 +3,27 @@ from urllib.parse import urlparse, urljoin
 import re
 import os
 
-from ....ytdldownloader import get_entry, get_unprocessed_entry
+from ....ytdldownloader import get_entry, get_unprocessed_entry, flat_entry_url, PagedEntries
+from ....infocache import parse_search
 from .... import messagemanager
 from .... import exceptions
 
 async def _get_url_info(ctx, song_url):
     info = await ctx.bot.downloader.extract_info(song_url, download=False, process=False)
+    # Playlists are iterated page by page later on, processing them here would resolve every single entry up front
+    if info and 'entries' in info:
+        return (info, None, None)
+
+    # Text gets turned into a search url, extract that directly so the result can come from the search cache
+    if info and info.get('_type', None) == 'url' and parse_search(info.get('url', '')):
+        process_url = info['url']
+    else:
+        process_url = song_url
+
     # If there is an exception arise when processing we go on and let extract_info down the line report it
     # because info might be a playlist and thing that's broke it might be individual entry
     try:
-        info_process = await ctx.bot.downloader.extract_info(song_url, download=False)
+        info_process = await ctx.bot.downloader.extract_info(process_url, download=False)
         info_process_err = None
     except Exception as e:
         info_process = None
@@ -105,39 +116,28 @@ class YtdlEB(BaseEB):
                 info = info['entries'][0]
 
         if 'entries' in info:
-            entries = list(info_process['entries'])
+            entries = info['entries']
 
             if ctx.bot.config.lazy_playlist:
                 entry_initializer = get_unprocessed_entry
             else:
                 entry_initializer = get_entry
 
+            async def _make_entry(entry_info):
+                entry = await entry_initializer(flat_entry_url(entry_info), ctx.author.id, ctx.bot.downloader, {'channel_id':ctx.channel.id})
+                # show something nicer than a placeholder until the entry gets precached
+                if not entry.duration:
+                    entry.title = entry_info.get('title', None) or entry.title
+                    entry.duration = entry_info.get('duration', None) or None
+                return entry
+
             async def _get_entry_iterator():
-                # IF PY35 DEPRECATED
-                # for entry_proc in entries:
-                #     if not entry_proc:
-                #         yield None
-                #         continue
-                #     url = entry_proc.get('webpage_url', None) or entry_proc.get('url', None)
-                #     try:
-                #         entry_proc_o = await entry_initializer(url, ctx.author.id, ctx.bot.downloader, {'channel_id':ctx.channel.id})
-                #     except Exception as e:
-                #         ctx.bot.log.info(e)
-                #         yield None
-                #         continue
-                #     yield entry_proc_o
-                # return await get_entry(url, ctx.author.id, ctx.bot.downloader, {'channel_id':ctx.channel.id})
-                # END IF DEPRECATED
-                entry_list = list()
-                for entry_proc in entries:
-                    if not entry_proc:
-                        entry_list.append(None)
-                        continue
-                    url = entry_proc.get('webpage_url', None) or entry_proc.get('url', None)
-                    entry_list.append(entry_initializer(url, ctx.author.id, ctx.bot.downloader, {'channel_id':ctx.channel.id}))
-                return entry_list         
-
-            return (len(entries), _get_entry_iterator())
+                if isinstance(entries, list):
+                    return [_make_entry(entry_info) if entry_info else None for entry_info in entries]
+                return PagedEntries(ctx.bot.downloader, entries, _make_entry)
+
+            # length of the playlist is not known until all of its pages got fetched
+            return (len(entries) if isinstance(entries, list) else None, _get_entry_iterator())
 
         else:
             async def _get_entry_iterator():
@@ -225,6 +225,62 @@ class Information(InjectableMixin, Cog):
                 expire_in=30
             )
 
+    @command()
+    async def downloaderstats(self, ctx):
+        """
+        Usage:
+            {command_prefix}downloaderstats
+
+        Shows how many extractions were answered from the cache or shared with an identical running extraction,
+        how big the audio cache is and how often Spotify tracks were matched without searching.
+        """
+        stats = ctx.bot.downloader.get_stats()
+        lines = ['```']
+        lines.extend('{}: {}'.format(name, stats[name]) for name in sorted(stats))
+        spotify_stats = ctx.bot.spotify_matches.get_stats()
+        lines.extend('spotify_match_{}: {}'.format(name, spotify_stats[name]) for name in sorted(spotify_stats))
+        lines.append('```')
+        await messagemanager.safe_send_normal(ctx, ctx, '\n'.join(lines), expire_in=60)
+
+    @command()
+    async def audiostats(self, ctx):
+        """
+        Usage:
+            {command_prefix}audiostats
+
+        Shows how smoothly audio is being read in this server: time between frames over the last minute
+        and overall, empty and short frames, how long songs took to start and how much CPU and memory
+        FFmpeg is using.
+        """
+        guild = get_guild(ctx.bot, ctx.guild)
+        player = await guild.get_player()
+        stats = await player.audio_stats()
+
+        lines = ['```']
+        for period in ('last_minute', 'total'):
+            frames = stats[period]
+            lines.append('{}: {} frames, {} empty, {} short, {} slow reads'.format(
+                period, frames['frames'], frames['empty_frames'], frames['short_frames'], frames['slow_reads']
+            ))
+            lines.append('  ' + ' '.join('{}:{}'.format(bucket, count) for bucket, count in frames['interval_histogram'].items() if count))
+
+        first_frame = stats['first_frame']
+        if first_frame['latest']:
+            lines.append('first_frame: average {}s, max {}s, last {}s'.format(
+                first_frame['average'], first_frame['max'], first_frame['latest'][-1]['seconds']
+            ))
+
+        ffmpeg = stats['ffmpeg']
+        if ffmpeg:
+            lines.append('ffmpeg: pid {}, cpu {}%, rss {:.1f} MiB'.format(ffmpeg['pid'], ffmpeg['cpu_percent'], ffmpeg['rss'] / 1048576))
+
+        lines.extend('buffer_{}: {}'.format(name, value) for name, value in sorted(stats['buffer'].items()))
+        lines.extend('{}: {}'.format(name, value) for name, value in sorted(stats['stream'].items()))
+        if stats['current_stream']:
+            lines.append('current_stream: {reconnects} reconnects, {stalls} stalls, backoff {backoff}s'.format(**stats['current_stream']))
+        lines.append('```')
+        await messagemanager.safe_send_normal(ctx, ctx, '\n'.join(lines), expire_in=60)
+
     @command()
     async def id(self, ctx, user:Optional[discord.User]):
         """
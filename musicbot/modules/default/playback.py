@@ -1,6 +1,7 @@
 import logging
 from typing import Optional
 from asyncio import ensure_future
+from datetime import timedelta
 
 from discord.ext.commands import Cog, command
 
@@ -9,6 +10,8 @@ from ... import exceptions
 from ...rich_guild import get_guild
 from ... import messagemanager
 from ...playback import PlayerState
+from ... import dsp as dsp_module
+from ...utils import parse_size, format_size, fixg, parse_time, ftimedelta
 
 log = logging.getLogger(__name__)
 
@@ -105,6 +108,171 @@ class Playback(Cog):
         else:
             raise exceptions.CommandError(ctx.bot.str.get('cmd-pause-none', 'Player is not playing.'), expire_in=30)
 
+    @command()
+    async def precache(self, ctx, depth:Optional[str]=None, budget:Optional[str]=None):
+        """
+        Usage:
+            {command_prefix}precache [depth|default] [budget]
+
+        Sets how many upcoming songs are downloaded ahead of time and how much (e.g. 200M) may be
+        downloaded ahead beyond the next song, 0 means no limit. Without arguments, shows the current
+        settings and how often playback had to wait for a download.
+        """
+        guild = get_guild(ctx.bot, ctx.guild)
+        player = await guild.get_player()
+
+        if depth:
+            if depth == 'default':
+                guild.config.precache_depth = None
+                guild.config.precache_budget = None
+            else:
+                try:
+                    depth = int(depth)
+                    budget = parse_size(budget) if budget else None
+                except (ValueError, KeyError):
+                    raise exceptions.CommandError('Invalid precache depth or budget.', expire_in=20)
+                if depth < 1:
+                    raise exceptions.CommandError('Precache depth must be at least 1.', expire_in=20)
+                guild.config.precache_depth = depth
+                guild.config.precache_budget = budget
+
+            playlist = await player.get_playlist()
+            if playlist:
+                playlist.set_precache(*guild.config.get_precache())
+
+        depth, budget = guild.config.get_precache()
+        stats = player.cache_stats
+        waited = stats['waited']
+        total = waited + stats['ready']
+        reply_msg = 'Precaching {} songs ahead with {}.\nPlayback waited for download {} out of {} times ({}s in total).'.format(
+            depth,
+            'a budget of {}'.format(format_size(budget)) if budget else 'no budget',
+            waited,
+            total,
+            fixg(stats['wait_seconds'])
+        )
+        await messagemanager.safe_send_normal(ctx, ctx, reply_msg, expire_in=30)
+
+    async def _seek(self, ctx, position):
+        guild = get_guild(ctx.bot, ctx.guild)
+        player = await guild.get_player()
+        try:
+            position = await player.seek(position)
+        except exceptions.PlaybackError as e:
+            raise exceptions.CommandError('Cannot seek: {}'.format(e), expire_in=20)
+        await messagemanager.safe_send_normal(ctx, ctx, 'Continuing from {}.'.format(ftimedelta(timedelta(seconds=position))), expire_in=20)
+
+    @command()
+    async def seek(self, ctx, position:str):
+        """
+        Usage:
+            {command_prefix}seek [time]
+
+        Continue the current song from the given time, e.g. 90 or 1:30.
+        """
+        try:
+            position = parse_time(position)
+        except ValueError:
+            raise exceptions.CommandError('Invalid time {}.'.format(position), expire_in=20)
+        await self._seek(ctx, position)
+
+    @command()
+    async def forward(self, ctx, seconds:Optional[str]='10'):
+        """
+        Usage:
+            {command_prefix}forward [time]
+
+        Skip ahead in the current song by the given time, 10 seconds by default.
+        """
+        try:
+            seconds = parse_time(seconds)
+        except ValueError:
+            raise exceptions.CommandError('Invalid time {}.'.format(seconds), expire_in=20)
+        player = await get_guild(ctx.bot, ctx.guild).get_player()
+        try:
+            progress = await player.progress()
+        except Exception:
+            raise exceptions.CommandError('Nothing is playing.', expire_in=20)
+        await self._seek(ctx, progress + seconds)
+
+    @command()
+    async def rewind(self, ctx, seconds:Optional[str]='10'):
+        """
+        Usage:
+            {command_prefix}rewind [time]
+
+        Go back in the current song by the given time, 10 seconds by default.
+        """
+        try:
+            seconds = parse_time(seconds)
+        except ValueError:
+            raise exceptions.CommandError('Invalid time {}.'.format(seconds), expire_in=20)
+        player = await get_guild(ctx.bot, ctx.guild).get_player()
+        try:
+            progress = await player.progress()
+        except Exception:
+            raise exceptions.CommandError('Nothing is playing.', expire_in=20)
+        await self._seek(ctx, progress - seconds)
+
+    @command()
+    async def dsp(self, ctx, mode:Optional[str]=None, *leftover_args):
+        """
+        Usage:
+            {command_prefix}dsp
+            {command_prefix}dsp fadein [seconds]
+            {command_prefix}dsp fadeout [seconds]
+            {command_prefix}dsp eq [lowshelf|highshelf|peak] [frequency] [gain in dB] [q]
+            {command_prefix}dsp remove/r [position]
+            {command_prefix}dsp clear
+
+        Apply or remove effects processed by the bot itself. Unlike the effect command, changes take
+        effect immediately on the song that is playing. Without arguments, lists the effects.
+        Needs numpy, see requirements-extra.txt.
+        """
+        if not dsp_module.available:
+            raise exceptions.CommandError(
+                'The dsp command needs numpy, which is not installed. Install it with `pip install -U -r requirements-extra.txt` and restart the bot.',
+                expire_in=30
+            )
+
+        guild = get_guild(ctx.bot, ctx.guild)
+        player = await guild.get_player()
+
+        effects = list(player.dsp_effects)
+        try:
+            if mode in ['fadein', 'fadeout']:
+                seconds = float(leftover_args[0])
+                if seconds <= 0:
+                    raise ValueError()
+                effects.append((mode, seconds))
+            elif mode == 'eq':
+                kind = leftover_args[0]
+                freq = float(leftover_args[1])
+                gain = float(leftover_args[2])
+                q = float(leftover_args[3]) if len(leftover_args) > 3 else 0.707
+                if kind not in dsp_module.EQ_TYPES or not 0 < freq < dsp_module.SAMPLING_RATE / 2 or q <= 0:
+                    raise ValueError()
+                effects.append(('eq', kind, freq, gain, q))
+            elif mode in ['remove', 'r']:
+                effects.pop(int(leftover_args[0]) - 1)
+            elif mode == 'clear':
+                effects.clear()
+            elif mode:
+                raise exceptions.CommandError('Unknown dsp mode {}.'.format(mode), expire_in=20)
+        except (ValueError, IndexError):
+            raise exceptions.CommandError('Invalid arguments, see {}help dsp.'.format(ctx.bot.config.command_prefix), expire_in=20)
+
+        if mode:
+            player.set_dsp_effects(effects)
+
+        if effects:
+            reply_msg = 'Effects:\n{}'.format('\n'.join(
+                '{}. {}'.format(idx, ' '.join(str(arg) for arg in effect)) for idx, effect in enumerate(effects, 1)
+            ))
+        else:
+            reply_msg = 'No effects.'
+        await messagemanager.safe_send_normal(ctx, ctx, reply_msg, expire_in=30)
+
     @command()
     async def effect(self, ctx, mode, fx, *leftover_args):
         """
@@ -10,7 +10,7 @@ import math
 from urllib.parse import urljoin
 from typing import Optional, Union
 from datetime import timedelta
-from collections import defaultdict
+from collections import defaultdict, deque
 
 from textwrap import dedent
 
@@ -126,7 +126,7 @@ class QueueManagement(Cog):
             entry_iter = await entry_iter
             # END IF DEPRECATED
 
-            if count < 1:
+            if count is not None and count < 1:
                 raise exceptions.ExtractionError("Could not get any entry while extracting result for: {}".format(song_url))
 
             async with self._aiolocks['play_{}'.format(ctx.author.id)]:
@@ -160,88 +160,157 @@ class QueueManagement(Cog):
                         # If it's playlist
 
                         # I have to do exe extra checks anyways because you can request an arbitrary number of search results
-                        if not permissions.allow_playlists and count > 1:
+                        if not permissions.allow_playlists:
                             raise exceptions.PermissionsError(ctx.bot.str.get('playlists-noperms', "You are not allowed to request playlists"), expire_in=30)
 
-                        if permissions.max_playlist_length and count > permissions.max_playlist_length:
-                            raise exceptions.PermissionsError(
-                                ctx.bot.str.get('playlists-big', "Playlist has too many entries ({0} > {1})").format(count, permissions.max_playlist_length),
-                                expire_in=30
-                            )
+                        queued_count = await playlist.num_entry_of(ctx.author.id)
 
-                        # This is a little bit weird when it says (x + 0 > y), I might add the other check back in
-                        if permissions.max_songs and player.playlist.num_entry_of(ctx.author.id) + count > permissions.max_songs:
-                            raise exceptions.PermissionsError(
-                                ctx.bot.str.get('playlists-limit', "Playlist entries + your already queued songs reached limit ({0} + {1} > {2})").format(
-                                    count, player.playlist.num_entry_of(ctx.author.id), permissions.max_songs),
-                                expire_in=30
-                            )
+                        # Playlists extracted page by page have no count, these limits get applied while adding instead
+                        if count is not None:
+                            if permissions.max_playlist_length and count > permissions.max_playlist_length:
+                                raise exceptions.PermissionsError(
+                                    ctx.bot.str.get('playlists-big', "Playlist has too many entries ({0} > {1})").format(count, permissions.max_playlist_length),
+                                    expire_in=30
+                                )
 
-                        t0 = time.time()
+                            # This is a little bit weird when it says (x + 0 > y), I might add the other check back in
+                            if permissions.max_songs and queued_count + count > permissions.max_songs:
+                                raise exceptions.PermissionsError(
+                                    ctx.bot.str.get('playlists-limit', "Playlist entries + your already queued songs reached limit ({0} + {1} > {2})").format(
+                                        count, queued_count, permissions.max_songs),
+                                    expire_in=30
+                                )
+
+                        limits = []
+                        if permissions.max_playlist_length:
+                            limits.append(permissions.max_playlist_length)
+                        if permissions.max_songs:
+                            limits.append(permissions.max_songs - queued_count)
+                        add_limit = min(limits) if limits else None
+                        truncated = False
 
-                        # My test was 1.2 seconds per song, but we maybe should fudge it a bit, unless we can
-                        # monitor it and edit the message with the estimated time, but that's some ADVANCED SHIT
-                        # I don't think we can hook into it anyways, so this will have to do.
-                        # It would probably be a thread to check a few playlists and get the speed from that
-                        # Different playlists might download at different speeds though
-                        wait_per_song = 1.2
+                        t0 = time.time()
                         drop_count = 0
                         actual_count = 0
+                        added_count = 0
 
                         procmesg = await messagemanager.safe_send_normal(
                             ctx,
                             ctx,
-                            'Gathering playlist information for {0} songs{1}'.format(
-                                count,
-                                ', ETA: {0} seconds'.format(
-                                    fixg(count * wait_per_song)
-                                ) if count >= 10 else '.'
-                            )
+                            'Gathering playlist information for {0} songs.'.format(count) if count is not None else 'Gathering playlist information.'
                         )
-                        
+
                         # TODO: I can create an event emitter object instead, add event functions, and every play list might be asyncified
                         #       Also have a "verify_entry" hook with the entry as an arg and returns the entry if its ok
 
                         # @TheerapakG: IDK if ^ is still applicable
 
-                        # IF PY35 DEPRECATED
-                        # async for c_entry in entry_iter:
-                        for a_c_entry in entry_iter:
-                            if a_c_entry:
-                                c_entry = await a_c_entry
-                            else:
-                                c_entry = a_c_entry
-                        # END IF DEPRECATED
-                            actual_count += 1
-
-                            if c_entry is None:
-                                drop_count += 1
-                                continue
+                        # Resolve a window of entries concurrently but add them in the playlist order. Lookups end up in the
+                        # downloader's extractor threads, so keeping twice as many in flight is enough to keep them all busy.
+                        window = ctx.bot.config.extractor_threads * 2
+                        is_async = hasattr(entry_iter, '__aiter__')
+                        a_c_entries = entry_iter.__aiter__() if is_async else iter(entry_iter)
+                        pending = deque()
+                        last_edit = t0
+                        exhausted = False
+
+                        async def fill_window():
+                            nonlocal exhausted
+                            while not exhausted and len(pending) < window:
+                                try:
+                                    a_c_entry = (await a_c_entries.__anext__()) if is_async else next(a_c_entries)
+                                except (StopIteration, StopAsyncIteration):
+                                    exhausted = True
+                                    return
+                                pending.append(asyncio.ensure_future(a_c_entry) if a_c_entry else None)
+
+                        await fill_window()
 
-                            duration = c_entry.get_duration()
-                            if permissions.max_song_length and duration > timedelta(seconds=permissions.max_song_length):
-                                drop_count += 1
-                                continue
-                                
-                            position_potent = await playlist.add_entry(c_entry)
-                            if not entry:
-                                entry = c_entry
-                                position = position_potent
+                        try:
+                            while pending:
+                                a_c_entry = pending.popleft()
+                                try:
+                                    c_entry = await a_c_entry if a_c_entry else None
+                                except Exception as e:
+                                    ctx.bot.log.info('Dropping playlist entry: {}'.format(e))
+                                    c_entry = None
+                                await fill_window()
+                                actual_count += 1
+
+                                tnow = time.time()
+                                if procmesg and tnow - last_edit >= 3:
+                                    last_edit = tnow
+                                    rate = actual_count / (tnow - t0)
+                                    await messagemanager.safe_edit_normal(
+                                        ctx,
+                                        procmesg,
+                                        'Gathering playlist information for {0} songs: {1} done ({2} songs/s), ETA: {3} seconds'.format(
+                                            count,
+                                            actual_count,
+                                            fixg(rate),
+                                            fixg((count - actual_count) / rate) if rate else '?'
+                                        ) if count is not None else 'Gathering playlist information: {0} songs done ({1} songs/s)'.format(
+                                            actual_count,
+                                            fixg(rate)
+                                        ),
+                                        quiet=True
+                                    )
+
+                                if c_entry is None:
+                                    drop_count += 1
+                                    continue
+
+                                duration = c_entry.get_duration()
+                                if permissions.max_song_length and duration and duration > timedelta(seconds=permissions.max_song_length):
+                                    drop_count += 1
+                                    continue
+
+                                if add_limit is not None and added_count >= add_limit:
+                                    truncated = True
+                                    break
+
+                                position_potent = await playlist.add_entry(c_entry)
+                                added_count += 1
+                                if not entry:
+                                    entry = c_entry
+                                    position = position_potent
+                                    # get the music going instead of waiting for the rest of the playlist
+                                    if playlist is (await guild.get_playlist()):
+                                        await guild.return_from_auto(also_skip=ctx.bot.config.skip_if_auto)
+                        finally:
+                            for a_c_entry in pending:
+                                if a_c_entry:
+                                    a_c_entry.cancel()
 
                         tnow = time.time()
                         ttime = tnow - t0
 
                         ctx.bot.log.info(
-                            "Processed {} songs in {} seconds at {:.2f}s/song, {:+.2g}/song from expected".format(
+                            "Processed {} songs in {} seconds at {:.2f}s/song".format(
                                 actual_count,
                                 fixg(ttime),
-                                ttime / actual_count if actual_count else 0,
-                                ttime / actual_count - wait_per_song if actual_count - wait_per_song else 0
+                                ttime / actual_count if actual_count else 0
                             )
                         )
 
+                        if procmesg:
+                            await messagemanager.safe_edit_normal(
+                                ctx,
+                                procmesg,
+                                'Gathered playlist information for {0} songs in {1} seconds.'.format(actual_count, fixg(ttime)),
+                                quiet=True
+                            )
+
                         reply_text = "Enqueued **%s** songs to be played. Position of the first entry in queue: %s"
-                        btext = str(actual_count - drop_count)                  
+                        btext = str(added_count)
+                        if truncated:
+                            if not entry:
+                                raise exceptions.PermissionsError(
+                                    ctx.bot.str.get('playlists-limit', "Playlist entries + your already queued songs reached limit ({0} + {1} > {2})").format(
+                                        '?', queued_count, permissions.max_songs),
+                                    expire_in=30
+                                )
+                            btext = '{} (limited to {})'.format(added_count, add_limit)                  
 
                     if playlist is (await guild.get_playlist()):
                         await guild.return_from_auto(also_skip=ctx.bot.config.skip_if_auto)
@@ -137,6 +137,8 @@ class Webapi(Cog):
                 return await get_member_list(self.bot, int(param['guild']))
             elif param['get'] == 'player' and 'guild' in param:
                 return await get_player(self.bot, int(param['guild']))
+            elif param['get'] == 'audiostats' and 'guild' in param:
+                return await get_audiostats(self.bot, int(param['guild']))
         return None
 
     async def gen_content_POST(self, request):
@@ -237,4 +239,14 @@ async def get_player(bot, guildid):
     guild = get_guild(bot, bot.get_guild(guildid))
     player = await guild.get_player()
     playlist = await player.get_playlist()
-    return {'voiceclientid':guild._voice_client.session_id, 'playerplaylist':[{'entryurl':entry.source_url, 'entrytitle':entry.title} for entry in playlist], 'playercurrententry':{'entryurl':player._current.source_url, 'entrytitle':player._current.title} if player._current else dict(), 'playerstate':str(player.state), 'playlistkaraokemode':playlist.karaoke_mode} if player else dict()
\ No newline at end of file
+    return {'voiceclientid':guild._voice_client.session_id, 'playerplaylist':[{'entryurl':entry.source_url, 'entrytitle':entry.title} for entry in playlist], 'playercurrententry':{'entryurl':player._current.source_url, 'entrytitle':player._current.title} if player._current else dict(), 'playerstate':str(player.state), 'playlistkaraokemode':playlist.karaoke_mode} if player else dict()
+
+async def get_audiostats(bot, guildid):
+    # structure:
+    # return = dict(total, last_minute, first_frame, ffmpeg, buffer, cache) | dict()
+    # total, last_minute = dict(frames, empty_frames, short_frames, slow_reads, interval_histogram)
+    # first_frame = dict(latest, average, max)
+    # ffmpeg = dict(pid, cpu_percent, cpu_seconds, rss) | None
+    guild = get_guild(bot, bot.get_guild(guildid))
+    player = await guild.get_player()
+    return await player.audio_stats() if player else dict()
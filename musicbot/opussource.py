@@ -0,0 +1,124 @@
+"""
+Zero-transcode playback of cached opus files.
+
+Most YouTube downloads are opus in WebM already. OpusFileAudio sends their packets to Discord as
+they are, instead of having FFmpeg decode them to PCM and discord.py encode them back to opus
+every 20ms. Packets are only decoded and re-encoded while the volume is not 100% (or the packet
+is not exactly 20ms long, which Discord expects).
+"""
+
+import audioop
+import ctypes
+
+from discord import opus
+from discord.player import AudioSource
+
+from .lib.opusdemux import opus_packets, packet_samples, is_opus_file
+
+_decoder_lib = None
+
+def _get_decoder_lib():
+    # discord.py only declares the encoder functions of libopus
+    global _decoder_lib
+    if _decoder_lib is None:
+        lib = opus._lib
+        lib.opus_decoder_create.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
+        lib.opus_decoder_create.restype = ctypes.c_void_p
+        lib.opus_decode.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int32, ctypes.POINTER(ctypes.c_int16), ctypes.c_int, ctypes.c_int]
+        lib.opus_decode.restype = ctypes.c_int
+        lib.opus_decoder_destroy.argtypes = [ctypes.c_void_p]
+        lib.opus_decoder_destroy.restype = None
+        _decoder_lib = lib
+    return _decoder_lib
+
+class OpusDecoder:
+    SAMPLING_RATE = opus.Encoder.SAMPLING_RATE
+    CHANNELS = opus.Encoder.CHANNELS
+    # longest possible opus packet is 120ms
+    MAX_SAMPLES = SAMPLING_RATE * 120 // 1000
+
+    def __init__(self):
+        self._lib = _get_decoder_lib()
+        error = ctypes.c_int()
+        self._state = self._lib.opus_decoder_create(self.SAMPLING_RATE, self.CHANNELS, ctypes.byref(error))
+        if error.value != 0:
+            raise opus.OpusError(error.value)
+        self._pcm = (ctypes.c_int16 * (self.MAX_SAMPLES * self.CHANNELS))()
+
+    def __del__(self):
+        if getattr(self, '_state', None):
+            self._lib.opus_decoder_destroy(self._state)
+            self._state = None
+
+    def decode(self, packet):
+        """
+        Decode a packet to 16 bit interleaved stereo PCM.
+        """
+        samples = self._lib.opus_decode(self._state, packet, len(packet), self._pcm, self.MAX_SAMPLES, 0)
+        if samples < 0:
+            raise opus.OpusError(samples)
+        return ctypes.string_at(self._pcm, samples * self.CHANNELS * 2)
+
+def can_play(path):
+    """
+    Whether the file can be played by OpusFileAudio, blocks on file reads.
+    """
+    return opus.is_loaded() and is_opus_file(path)
+
+class OpusFileAudio(AudioSource):
+    def __init__(self, path, volume=1.0, start=0):
+        self.path = path
+        self.volume = volume
+        self._file = open(path, 'rb')
+        self._packets = opus_packets(self._file)
+        # samples to skip before playing, skipped on the first read to not block the event loop
+        self._skip = start
+        self._decoder = None
+        self._encoder = None
+        # decoded audio that is not sent yet
+        self._pcm = b''
+        # number of frames that could not be sent as they are
+        self.reencoded = 0
+
+    def is_opus(self):
+        return True
+
+    def _encode(self):
+        frame, self._pcm = self._pcm[:opus.Encoder.FRAME_SIZE], self._pcm[opus.Encoder.FRAME_SIZE:]
+        if len(frame) < opus.Encoder.FRAME_SIZE:
+            frame += b'\x00' * (opus.Encoder.FRAME_SIZE - len(frame))
+        if self.volume != 1.0:
+            frame = audioop.mul(frame, 2, min(self.volume, 2.0))
+        self.reencoded += 1
+        return self._encoder.encode(frame, opus.Encoder.SAMPLES_PER_FRAME)
+
+    def _skip_packets(self):
+        skipped = 0
+        for packet in self._packets:
+            skipped += packet_samples(packet)
+            if skipped >= self._skip:
+                break
+        self._skip = 0
+
+    def read(self):
+        if self._skip:
+            self._skip_packets()
+
+        while len(self._pcm) < opus.Encoder.FRAME_SIZE:
+            packet = next(self._packets, None)
+            if packet is None:
+                # send what is left, padded with silence
+                return self._encode() if self._pcm else b''
+
+            if not self._pcm and self.volume == 1.0 and packet_samples(packet) == opus.Encoder.SAMPLES_PER_FRAME:
+                return packet
+
+            if not self._decoder:
+                self._decoder = OpusDecoder()
+                self._encoder = opus.Encoder()
+            self._pcm += self._decoder.decode(packet)
+
+        return self._encode()
+
+    def cleanup(self):
+        self._file.close()
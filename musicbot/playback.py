@@ -49,18 +49,26 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
 
-from asyncio import Lock, CancelledError, run_coroutine_threadsafe, sleep, Future, ensure_future, Event
+from asyncio import Lock, CancelledError, run_coroutine_threadsafe, Future, ensure_future, Event
 from enum import Enum
 from collections import defaultdict, deque
 from typing import Union, Optional
-from discord import FFmpegPCMAudio, PCMVolumeTransformer, AudioSource
+from discord import FFmpegPCMAudio, PCMVolumeTransformer, AudioSource, opus
 from functools import partial
-from .utils import callback_dummy_future
+from .utils import callback_dummy_future, fixg
 from .ffmpegoptions import get_equalize_option
+from . import progressive
+from . import opussource
+from . import broadcast
+from . import dsp
+from .playbackbuffer import BufferedSource
+from .streamwatchdog import StreamWatchdog
+from .telemetry import PlaybackTelemetry
 from itertools import islice
 from datetime import timedelta
 import traceback
 import threading
+import time
 import subprocess
 import json
 import os
@@ -71,17 +79,28 @@ from .constructs import Serializable, Serializer
 from .exceptions import VersionError, PlaybackError, InvalidDataError
 import logging
 
-# optionally using pymediainfo instead of ffprobe if presents
-try:
-    import pymediainfo
-except:
-    pymediainfo = None
-
 log = logging.getLogger()
 
 url_map = defaultdict(list)
 
+# how long before the end of an entry the next one gets started, and how much of it is read ahead
+_preroll_seconds = 5
+_preroll_frames = 10
+
+# longest ffmpeg waits between its own attempts to reconnect to a stream
+_reconnect_delay_max = 5
+# streams whose url expires sooner than this get resolved again before playing
+_url_expiry_margin = 30
+
+# used for estimating download size of an entry when checking the precache budget
+_precache_assumed_bitrate = 160000
+_precache_assumed_duration = 240
+
 def _entry_cleanup(entry, bot):
+    if entry and entry._progressive_path and entry._cache_task and not entry._cache_task.done():
+        # skipped while still being downloaded for progressive playback, clean up when the file is there
+        entry._cache_task.add_done_callback(lambda _: _entry_cleanup(entry, bot))
+        return
     if entry and entry._local_url:
         url_map[entry._local_url].remove(entry)
     bot.log.debug(url_map[entry._local_url])
@@ -96,6 +115,7 @@ def _entry_cleanup(entry, bot):
                 for x in range(30):
                     try:
                         os.unlink(filename)
+                        bot.downloader.cache_index.remove(filename)
                         bot.log.debug('File deleted: {0}'.format(filename))
                         break
                     except PermissionError as e:
@@ -123,10 +143,13 @@ class Entry(Serializable):
         self._preparing_cache = False
         self._cached = False
         self._cache_task = None # playlists set this
+        self._progressive_path = None # path of the file while it is being downloaded
         self._metadata = metadata
         self._local_url = None
         self.stream = stream
         self.local = local
+        # of streams, whether it is live as far as youtube_dl knows
+        self.is_live = None
 
     def __json__(self):
         return self._enclose_json({
@@ -204,6 +227,24 @@ class Entry(Serializable):
         self._local_url = local_url
         url_map[local_url].append(self)
 
+    async def refresh_url(self):
+        """
+        Resolve where to play the entry from again, for when the old one stopped working.
+        """
+        return self._local_url
+
+    async def resolve_url(self):
+        """
+        Like refresh_url, but without changing the entry.
+        """
+        return self._local_url
+
+    def url_expired(self, margin=0):
+        """
+        Whether where the entry plays from is known to stop working within margin seconds.
+        """
+        return False
+
 class EntriesHolder(EventEmitter, Serializable):
     def __init__(self):
         super().__init__()
@@ -245,6 +286,9 @@ class EntriesHolder(EventEmitter, Serializable):
     async def _get_entry(self, random = False, keep_entry = False):
         raise NotImplementedError()
 
+    def _take_entry(self, entry):
+        raise NotImplementedError()
+
     def _add_entry(self, entry, *, head = False):
         raise NotImplementedError()
 
@@ -273,6 +317,9 @@ class Playlist(EntriesHolder):
         self._threadlocks = defaultdict(threading.Lock)
         self._list = deque()
         self._precache = 1
+        self._precache_budget = 0
+        # entries that we started precaching because they are near the front of the queue
+        self._precaching = set()
 
     def __json__(self):
         return self._enclose_json({
@@ -327,6 +374,7 @@ class Playlist(EntriesHolder):
         return pl
 
     async def stop(self):
+        self._precaching.clear()
         for entry in self._list:
             if entry._cache_task:
                 entry._cache_task.cancel()
@@ -338,17 +386,67 @@ class Playlist(EntriesHolder):
                 entry._preparing_cache = False
                 entry._cached = False
 
-    def _shuffle(self):
-        shuffle(self._list)
-        for entry in self._list[:self._precache]:
+    def set_precache(self, depth, budget = 0):
+        self._precache = max(depth, 1)
+        self._precache_budget = budget
+        self._retarget_precache()
+
+    def _estimate_size(self, entry):
+        if entry.stream or entry.local:
+            return 0
+        record = self._bot.downloader.cache_index.get(entry._local_url) if entry._local_url else None
+        if record:
+            return 0
+        return (entry.duration or _precache_assumed_duration) * _precache_assumed_bitrate // 8
+
+    def _precache_targets(self):
+        spent = 0
+        for position, entry in enumerate(islice(self._list, self._precache)):
+            # the next entry is always precached regardless of the budget
+            if position and self._precache_budget and not (entry._cache_task and entry._cache_task.done()):
+                spent += self._estimate_size(entry)
+                if spent > self._precache_budget:
+                    return
+            yield entry
+
+    def _cancel_precache(self, entry):
+        task = entry._cache_task
+        entry._cache_task = None
+        if task and not task.done():
+            task.cancel()
+            def reset(_):
+                # prepare_cache marks the entry as cached even when cancelled
+                if not entry._cache_task:
+                    entry._preparing_cache = False
+                    entry._cached = False
+            task.add_done_callback(reset)
+
+    def _retarget_precache(self):
+        """
+        Make sure entries near the front of the queue are being precached, and stop
+        precaching entries that are no longer near the front.
+        """
+        targets = set()
+        for entry in self._precache_targets():
+            targets.add(entry)
             if not entry._cache_task:
                 entry._cache_task = ensure_future(entry.prepare_cache())
 
+        for entry in self._precaching - targets:
+            self._cancel_precache(entry)
+
+        self._precaching = {entry for entry in targets if not entry._cache_task.done()}
+
+    def _shuffle(self):
+        shuffle(self._list)
+        self._retarget_precache()
+
     async def shuffle(self):
         self._shuffle()
 
     async def clear(self):
         self._list.clear()
+        self._retarget_precache()
 
     def get_name(self):
         return self._name
@@ -361,6 +459,7 @@ class Playlist(EntriesHolder):
             self._shuffle()
 
         entry = self._list.popleft()
+        self._precaching.discard(entry)
         if not entry._cache_task:
             entry._cache_task = ensure_future(entry.prepare_cache())
 
@@ -369,22 +468,31 @@ class Playlist(EntriesHolder):
             if entry._local_url:
                 url_map[entry._local_url].append(entry)
 
-        if self._precache <= len(self._list):
-            consider = self._list[self._precache - 1]
-            if not consider and not consider._cache_task:
-                consider._cache_task = ensure_future(consider.prepare_cache())                
+        self._retarget_precache()
 
         return (entry, entry._cache_task)
 
+    def _take_entry(self, entry):
+        """
+        Remove entry that started playing without going through _get_entry (see Player._preroll).
+        """
+        try:
+            self._list.remove(entry)
+        except ValueError:
+            pass
+        self._precaching.discard(entry)
+        self._retarget_precache()
+
     def _add_entry(self, entry, *, head = False):
         if head:
             self._list.appendleft(entry)
             position = 0
+            self._retarget_precache()
         else:
             self._list.append(entry)
             position = len(self._list) - 1
-        if self._precache > position and not entry._cache_task:
-            entry._cache_task = ensure_future(entry.prepare_cache())
+            if self._precache > position:
+                self._retarget_precache()
         self.emit('entry-added', playlist=self, entry=entry)
         return position + 1   
 
@@ -395,17 +503,11 @@ class Playlist(EntriesHolder):
         return len(self._list)
 
     async def remove_position(self, position):
-        if position < self._precache:
-            if self._list[position]._cache_task:
-                self._list[position]._cache_task.cancel()
-                self._list[position]._cache_task = None
-            if self._precache <= len(self._list):
-                consider = self._list[self._precache - 1]
-                if not consider._cache_task:
-                    consider._cache_task = ensure_future(consider.prepare_cache())
         val = self._list[position]
         _entry_cleanup(val, self._bot)
         del self._list[position]
+        if position < self._precache:
+            self._retarget_precache()
         return val
 
     async def get_entry_position(self, entry):
@@ -446,19 +548,110 @@ class SourcePlaybackCounter(AudioSource):
     def __init__(self, source, progress = 0):
         self._source = source
         self.progress = progress
+        # frames read ahead of time by preroll
+        self._buffer = deque()
+        # set by the player, see telemetry.PlaybackTelemetry
+        self.telemetry = None
+        self.title = None
+        # perf_counter time the entry got picked to play, cleared after its first frame
+        self.requested_at = None
+        # the ffmpeg process decoding this source if it has one of its own
+        self.process = None
+        # the StreamWatchdog restarting this source if it is a stream
+        self.watchdog = None
+
+    def preroll(self, frames):
+        """
+        Read the first frames ahead so that the source is running by the time it is played. Blocks.
+        """
+        for _ in range(frames):
+            res = self._source.read()
+            if not res:
+                break
+            self._buffer.append(res)
 
     def read(self):
-        res = self._source.read()
+        if not self.telemetry:
+            res = self._buffer.popleft() if self._buffer else self._source.read()
+            if res:
+                self.progress += 1
+            return res
+
+        start = time.perf_counter()
+        res = self._buffer.popleft() if self._buffer else self._source.read()
+        end = time.perf_counter()
         if res:
             self.progress += 1
+            if self.requested_at is not None:
+                self.telemetry.record_first_frame(self.title, end - self.requested_at)
+                self.requested_at = None
+        self.telemetry.record_frame(start, end, len(res), None if self._source.is_opus() else opus.Encoder.FRAME_SIZE)
         return res
 
     def get_progress(self):
         return self.progress * 0.02
 
+    def is_opus(self):
+        return self._source.is_opus()
+
     def cleanup(self):
         self._source.cleanup()
 
+class GaplessSource(AudioSource):
+    """
+    The source the voice client actually plays: the current entry's source, followed on the very
+    next frame by the next entry's source if one got queued before the current one ended.
+    """
+    def __init__(self, source, on_handover):
+        self._lock = threading.Lock()
+        self.current = source
+        # (entry, source, callable telling whether it should still be played)
+        self._next = None
+        # called from the player thread with the entry and source that just started
+        self._on_handover = on_handover
+
+    def read(self):
+        with self._lock:
+            data = self.current.read()
+            if data or not self._next:
+                return data
+            entry, source, valid = self._next
+            self._next = None
+            if not valid():
+                return data
+            old = self.current
+            self.current = source
+            source.requested_at = time.perf_counter()
+            data = source.read()
+        old.cleanup()
+        self._on_handover(entry, source)
+        return data
+
+    def is_opus(self):
+        return self.current.is_opus()
+
+    def replace(self, source):
+        with self._lock:
+            old = self.current
+            self.current = source
+        return old
+
+    def queue(self, entry, source, valid):
+        with self._lock:
+            self._next = (entry, source, valid)
+
+    def unqueue(self):
+        """
+        Drop the queued next entry, return its (entry, source, valid) or None if nothing was queued.
+        """
+        with self._lock:
+            queued = self._next
+            self._next = None
+        return queued
+
+    def cleanup(self):
+        self.current.cleanup()
+
 class Player(AsyncEventEmitter, Serializable):
     def __init__(self, guild, volume = 0.15):
         super().__init__()
@@ -474,8 +667,27 @@ class Player(AsyncEventEmitter, Serializable):
         self._volume = volume
         self.state = PlayerState.PAUSE
         self.effects = list()
-        self.random = False
-        self.pull_persist = False
+        # effects applied in-process while playing, see dsp.DSPAudio
+        self.dsp_effects = list()
+        self._random = False
+        self._pull_persist = False
+        # how often playback had to wait for an entry to finish downloading
+        self.cache_stats = defaultdict(int)
+        # underruns, late frames and depth of the read-ahead buffers, see playbackbuffer
+        self.buffer_stats = defaultdict(int)
+        self.telemetry = PlaybackTelemetry()
+        # restarts of streams that stopped, see streamwatchdog
+        self.stream_stats = defaultdict(int)
+        # entry restored from a saved player and the frame it was at
+        self._resume_entry = None
+        self._resume_progress = 0
+        # what the voice client plays, see GaplessSource
+        self._chain = None
+        # (entry, source) of the next entry, started shortly before the current one ends
+        self._prerolled = None
+        self._preroll_handle = None
+        # set when there may be something to play now, see _play
+        self._entries_available = Event()
 
         ensure_future(self.play())
 
@@ -488,8 +700,10 @@ class Player(AsyncEventEmitter, Serializable):
             },
             'pl_name': self._playlist._name if self._playlist else None,
             'effects': self.effects,
+            'dsp_effects': self.dsp_effects,
             'random': self.random,
-            'pull_persist': self.pull_persist
+            'pull_persist': self.pull_persist,
+            'volume': self._volume
         })
 
     @classmethod
@@ -499,7 +713,7 @@ class Player(AsyncEventEmitter, Serializable):
         if 'version' not in data or data['version'] < 2:
             raise VersionError('data version needs to be higher than 2')
 
-        player = cls(guild)
+        player = cls(guild, volume=data.get('volume', guild._bot.config.default_volume))
 
         if 'version' not in data or data['version'] < 3:
             guild._bot.log.warning('upgrading player of `{}` to player version 4'.format(guild._id))
@@ -531,10 +745,10 @@ class Player(AsyncEventEmitter, Serializable):
         if current_entry_data['entry']:
             if player._playlist and not player.pull_persist:
                 player._playlist._add_entry(current_entry_data['entry'], head=True)
-                # TODO: progress stuff
-                # how do I even do this
-                # this would have to be in the entry class right?
-                # some sort of progress indicator to skip ahead with ffmpeg (however that works, reading and ignoring frames?)
+                # continue where it was when the player got saved
+                if current_entry_data.get('progress'):
+                    player._resume_entry = current_entry_data['entry']
+                    player._resume_progress = current_entry_data['progress']
             else:
                 # TODO: streamline this so that we don't have to rely on playlist in the first place
                 pass
@@ -542,6 +756,7 @@ class Player(AsyncEventEmitter, Serializable):
             player._playlist.on('entry-added', player.on_playlist_entry_added)
 
         player.effects = data['effects']
+        player.dsp_effects = data.get('dsp_effects', list())
 
         return player
 
@@ -558,6 +773,7 @@ class Player(AsyncEventEmitter, Serializable):
             guild._bot.log.exception("Failed to deserialize player {}".format(e))
 
     async def on_playlist_entry_added(self, playlist, entry):
+        self._entries_available.set()
         await self.emit('entry-added', player = self, playlist = playlist, entry = entry)
 
     @property
@@ -571,21 +787,90 @@ class Player(AsyncEventEmitter, Serializable):
             async with self._aiolocks['player']:
                 if self._source:
                     self._source._source.volume = val
+                if self._prerolled:
+                    self._prerolled[1]._source.volume = val
         ensure_future(set_if_source())
 
+    def set_dsp_effects(self, effects):
+        """
+        Replace the in-process effects, the song currently playing is affected from its next frame.
+        """
+        self.dsp_effects = effects
+        if self._source and isinstance(self._source._source, dsp.DSPAudio):
+            self._source._source.set_effects(effects)
+
     async def status(self):
         async with self._aiolocks['player']:
             return self.state
 
+    async def audio_stats(self):
+        """
+        Telemetry of the audio pipeline together with the buffer and cache counters, as a dict.
+        """
+        async with self._aiolocks['player']:
+            process = self._source.process if self._source else None
+            watchdog = self._source.watchdog if self._source else None
+            if self._source and isinstance(self._source._source, broadcast.BroadcastSubscriber):
+                shared = self._source._source.broadcast.source
+                if isinstance(shared, StreamWatchdog):
+                    watchdog = shared
+        stats = await self._guild._bot.loop.run_in_executor(None, self.telemetry.get_stats, process)
+        stats['buffer'] = dict(self.buffer_stats)
+        stats['cache'] = dict(self.cache_stats)
+        stats['stream'] = dict(self.stream_stats)
+        stats['current_stream'] = watchdog.get_stats() if watchdog else None
+        return stats
+
+    @property
+    def random(self):
+        return self._random
+
+    @random.setter
+    def random(self, val):
+        if val != self._random:
+            self._random = val
+            self._reset_preroll()
+
+    @property
+    def pull_persist(self):
+        return self._pull_persist
+
+    @pull_persist.setter
+    def pull_persist(self, val):
+        if val != self._pull_persist:
+            self._pull_persist = val
+            self._reset_preroll()
+
+    def _drop_preroll(self):
+        """
+        Stop the prerolled next entry from taking over, it is not what plays next anymore.
+        """
+        if self._preroll_handle:
+            self._preroll_handle.cancel()
+            self._preroll_handle = None
+        queued = self._chain.unqueue() if self._chain else None
+        # not queued anymore means it took over already, _handover takes care of it then
+        if queued and self._prerolled and self._prerolled[1] is queued[1]:
+            self._prerolled = None
+            queued[1].cleanup()
+
+    def _reset_preroll(self):
+        self._drop_preroll()
+        if self._current and self._chain and self.state == PlayerState.PLAYING:
+            self._schedule_preroll(self._current)
+
     def _set_playlist(self, pl: Optional[Playlist]):
         if self._playlist:
             self._playlist.off('entry-added', self.on_playlist_entry_added)
             self._playlist.remove_owner()
         if pl:
             pl.set_owner(self)
+            pl.set_precache(*self._guild.config.get_precache())
             self._playlist = pl.on('entry-added', self.on_playlist_entry_added)
         else:
             self._playlist = None
+        self._entries_available.set()
+        self._reset_preroll()
 
     async def set_playlist(self, pl: Optional[Playlist]):
         async with self._aiolocks['playlist']:
@@ -595,6 +880,148 @@ class Player(AsyncEventEmitter, Serializable):
         async with self._aiolocks['playlist']:
             return self._playlist
 
+    def _buffered(self, source):
+        seconds = self._guild._bot.config.playback_buffer
+        if not seconds:
+            return source
+        return BufferedSource(source, max(int(seconds * 50), 1), self.buffer_stats)
+
+    def _stream_source(self, entry, boptions, aoptions, shared=False):
+        """
+        Create the PCM AudioSource of a stream, restarted when it stops unless that is disabled.
+        A shared source outlives this player, so it leaves entry and the player's counters alone.
+        """
+        config = self._guild._bot.config
+
+        def create(url):
+            options = boptions
+            if url.startswith(('http://', 'https://')):
+                options += " -reconnect 1 -reconnect_streamed 1 -reconnect_delay_max {}".format(_reconnect_delay_max)
+            return FFmpegPCMAudio(url, before_options=options, options=aoptions, stderr=subprocess.PIPE)
+
+        if not config.stream_stall_timeout:
+            return self._buffered(create(entry._local_url))
+
+        def resolve():
+            refresh = entry.resolve_url() if shared else entry.refresh_url()
+            return run_coroutine_threadsafe(refresh, self._guild._bot.loop).result()
+
+        return StreamWatchdog(
+            entry._local_url,
+            create,
+            resolve,
+            int(config.playback_buffer * 50),
+            config.stream_stall_timeout,
+            config.stream_restarts,
+            broadcast.hub.stream_stats if shared else self.stream_stats,
+            entry.is_live,
+            entry.duration
+        )
+
+    async def _create_source(self, entry, pipe=None, progress=0):
+        """
+        Create the AudioSource playing entry, starting progress frames (of 20ms) into it.
+        Streams and entries played progressively from pipe always start from the beginning.
+        """
+        if entry.stream or pipe:
+            progress = 0
+        seconds = progress * 0.02
+
+        # reading the song from stdin, so ffmpeg cannot be told to ignore it
+        boptions = "-nostdin" if not pipe else ""
+        aoptions = "-vn"
+
+        if progress:
+            # input side seeking jumps to the nearest keyframe instead of decoding everything before
+            boptions += " -ss {}".format(fixg(seconds))
+
+        if self._guild._bot.config.use_experimental_equalization and not entry.stream:
+            # measured during precaching, never wait for it here
+            loudness = None
+            if not entry.local and not pipe and entry._local_url:
+                loudness = self._guild._bot.downloader.get_loudness(entry._local_url)
+                if not loudness:
+                    self._guild._bot.downloader.schedule_loudness(entry._local_url)
+            self.cache_stats['eq_measured' if loudness else 'eq_unmeasured'] += 1
+            aoptions += get_equalize_option(loudness)
+
+        if self.effects:
+            aoptions += " -af \"{}\"".format(', '.join(["{}{}".format(key, arg) for key, arg in self.effects]))
+
+        # anything that needs ffmpeg to filter the audio rules out sending the file as it is
+        passthrough = (
+            self._guild._bot.config.opus_passthrough and
+            # other volumes need decoding and encoding again, which ffmpeg does faster
+            self._volume == 1.0 and
+            not entry.stream and
+            not pipe and
+            not self.effects and
+            not self.dsp_effects and
+            not self._guild._bot.config.use_experimental_equalization and
+            await self._guild._bot.loop.run_in_executor(None, opussource.can_play, entry._local_url)
+        )
+
+        if passthrough:
+            self._guild._bot.log.debug("Creating opus passthrough player for {}".format(entry._local_url))
+            self.cache_stats['opus_passthrough'] += 1
+            source = SourcePlaybackCounter(
+                opussource.OpusFileAudio(entry._local_url, self._volume, int(seconds * opussource.OpusDecoder.SAMPLING_RATE)),
+                progress
+            )
+
+        elif entry.stream and entry.is_live and self._guild._bot.config.share_streams and not self.effects and not self.dsp_effects:
+            # every guild playing this stream shares one ffmpeg process and encoder
+            self._guild._bot.log.debug("Subscribing to shared stream {} with options: {} {}".format(entry.source_url, boptions, aoptions))
+            source = SourcePlaybackCounter(
+                broadcast.hub.subscribe(
+                    (entry.source_url, boptions, aoptions),
+                    lambda: self._stream_source(entry, boptions, aoptions, shared=True),
+                    self._volume
+                )
+            )
+
+        else:
+            self._guild._bot.log.debug("Creating player with options: {} {} {}".format(boptions, aoptions, entry._local_url if not pipe else 'pipe'))
+
+            try:
+                if entry.stream:
+                    decoder = None
+                    ffmpeg = self._stream_source(entry, boptions, aoptions)
+                else:
+                    decoder = FFmpegPCMAudio(
+                        entry._local_url if not pipe else pipe,
+                        pipe=bool(pipe),
+                        before_options=boptions,
+                        options=aoptions,
+                        stderr=subprocess.PIPE
+                    )
+                    ffmpeg = self._buffered(decoder)
+                if dsp.available:
+                    source = SourcePlaybackCounter(
+                        dsp.DSPAudio(
+                            ffmpeg,
+                            self._volume,
+                            self.dsp_effects,
+                            int(entry.duration * 50) if entry.duration else None,
+                            progress
+                        ),
+                        progress
+                    )
+                else:
+                    source = SourcePlaybackCounter(PCMVolumeTransformer(ffmpeg, self._volume), progress)
+                if decoder:
+                    source.process = decoder._process
+                elif isinstance(ffmpeg, StreamWatchdog):
+                    source.watchdog = ffmpeg
+            finally:
+                # ffmpeg got its own copy of the read end
+                if pipe:
+                    pipe.close()
+
+        source.telemetry = self.telemetry
+        source.title = entry.title
+        return source
+
     async def _play(self, *, play_wait_cb = None, play_success_cb = None):
         async with self._aiolocks['player']:
             self.state = PlayerState.WAITING
@@ -602,6 +1029,8 @@ class Player(AsyncEventEmitter, Serializable):
         entry = None
         self._guild._bot.log.debug('trying to get entry...')
         while not entry:
+            # cleared before looking so that an entry added while looking is not missed
+            self._entries_available.clear()
             try:
                 async with self._aiolocks['playlist']:
                     entry, cache = await self._playlist._get_entry(self.random, self.pull_persist)
@@ -616,7 +1045,8 @@ class Player(AsyncEventEmitter, Serializable):
                     play_wait_cb()
                     play_wait_cb = None
                     play_success_cb = None
-                await sleep(1)
+                # no playlist or it is empty, sleep until the playlist gets an entry or is replaced
+                await self._entries_available.wait()
             except Exception as e:
                 self._guild._bot.log.error(e)
 
@@ -630,6 +1060,10 @@ class Player(AsyncEventEmitter, Serializable):
                     self._current = None
                     self._player = None
                     self._source = None
+                    self._chain = None
+                    if self._preroll_handle:
+                        self._preroll_handle.cancel()
+                        self._preroll_handle = None
 
                 if error:
                     await self.emit('error', player=self, entry=entry, ex=error)
@@ -646,52 +1080,93 @@ class Player(AsyncEventEmitter, Serializable):
             future = run_coroutine_threadsafe(_async_playback_finished(), self._guild._bot.loop)
             future.result()
 
-        async def _download_and_play():
+        async def _start_progressive():
+            config = self._guild._bot.config
+            if not config.progressive_playback or not progressive.supported or entry.stream or cache.done():
+                return None
+
+            path = await progressive.wait_initial_buffer(entry, cache, config.progressive_buffer)
+            if not path:
+                return None
+
+            done = threading.Event()
+            cache.add_done_callback(lambda _: done.set())
             try:
-                self._guild._bot.log.debug('waiting for cache...')
-                await cache
-                self._guild._bot.log.debug('finish cache...')
-            except:
-                self._guild._bot.log.error('cannot cache...')
-                self._guild._bot.log.error(traceback.format_exc())
-                raise PlaybackError('cannot get the cache')
-
-            boptions = "-nostdin"
-            aoptions = "-vn"
-
-            if self._guild._bot.config.use_experimental_equalization and not entry.stream:
-                try:
-                    aoptions += await get_equalize_option(entry._local_url, self._guild._bot.log)
-                except Exception:
-                    self._guild._bot.log.error(
-                        'There as a problem with working out EQ, likely caused by a strange installation of FFmpeg. '
-                        'This has not impacted the ability for the bot to work, but will mean your tracks will not be equalised.'
-                    )
+                pipe = progressive.GrowingFileFeeder(path, done).start()
+            except FileNotFoundError:
+                # finished and got renamed in the meantime
+                return None
 
-            if self.effects:
-                aoptions += " -af \"{}\"".format(', '.join(["{}{}".format(key, arg) for key, arg in self.effects]))
+            self._guild._bot.log.debug('playing {} progressively from {}'.format(entry.title, path))
+            return pipe
 
-            self._guild._bot.log.debug("Creating player with options: {} {} {}".format(boptions, aoptions, entry._local_url))
+        async def _download_and_play():
+            requested_at = time.perf_counter()
+            waited = not cache.done()
+            wait_start = time.monotonic()
+            pipe = await _start_progressive()
 
-            source = SourcePlaybackCounter(
-                PCMVolumeTransformer(
-                    FFmpegPCMAudio(
-                        entry._local_url,
-                        before_options=boptions,
-                        options=aoptions,
-                        stderr=subprocess.PIPE
-                    ),
-                    self._volume
-                )
-            )
+            if not pipe:
+                try:
+                    self._guild._bot.log.debug('waiting for cache...')
+                    await cache
+                    self._guild._bot.log.debug('finish cache...')
+                except:
+                    self._guild._bot.log.error('cannot cache...')
+                    self._guild._bot.log.error(traceback.format_exc())
+                    raise PlaybackError('cannot get the cache')
+
+            if pipe:
+                self.cache_stats['progressive'] += 1
+            if waited:
+                self.cache_stats['waited'] += 1
+                self.cache_stats['wait_seconds'] += time.monotonic() - wait_start
+            else:
+                self.cache_stats['ready'] += 1
+
+            if not entry.stream and not entry.local and entry._local_url:
+                self._guild._bot.downloader.cache_index.touch(entry._local_url)
+
+            if entry.stream and entry.url_expired(_url_expiry_margin):
+                # normally refreshed in the background while queued, but never start on a dead url
+                self._guild._bot.log.debug('url of {} expired, resolving it again'.format(entry.title))
+                try:
+                    await entry.refresh_url()
+                except:
+                    self._guild._bot.log.error('cannot refresh expired url...')
+                    self._guild._bot.log.error(traceback.format_exc())
+                    raise PlaybackError('cannot refresh the expired url')
+                self.cache_stats['expired_refreshed'] += 1
+
+            progress = 0
+            if self._resume_entry is entry:
+                progress = self._resume_progress
+                self._guild._bot.log.debug('resuming {} from {}s'.format(entry.title, progress * 0.02))
+            self._resume_entry = None
+            self._resume_progress = 0
+
+            source = None
+            if self._prerolled:
+                prerolled_entry, prerolled_source = self._prerolled
+                self._prerolled = None
+                if prerolled_entry is entry and not progress:
+                    source = prerolled_source
+                else:
+                    prerolled_source.cleanup()
+            if not source:
+                source = await self._create_source(entry, pipe, progress)
+            source.requested_at = requested_at
 
             async with self._aiolocks['player']:
+                self.telemetry.reset_interval()
                 self._player = self._guild._voice_client
-                self._guild._voice_client.play(source, after=_playback_finished)
+                self._chain = GaplessSource(source, self._handover_threadsafe)
+                self._guild._voice_client.play(self._chain, after=_playback_finished)
                 self._source = source
                 self.state = PlayerState.PLAYING
 
             await self.emit('play', player=self, entry=self._current)
+            self._schedule_preroll(entry)
         
         async with self._aiolocks['playtask']:
             self._play_task = ensure_future(_download_and_play())            
@@ -732,7 +1207,12 @@ class Player(AsyncEventEmitter, Serializable):
 
                 if self._player:
                     self.state = PlayerState.PLAYING
+                    # time spent paused is not a gap between frames
+                    self.telemetry.reset_interval()
                     self._player.resume()
+                    # the preroll timer does not run while paused
+                    if self._current:
+                        self._schedule_preroll(self._current)
                     if play_success_cb:
                         play_success_cb()
                     await self.emit('resume', player=self, entry=self._current)
@@ -746,6 +1226,7 @@ class Player(AsyncEventEmitter, Serializable):
                 if self._player:
                     self._player.pause()
                     self.state = PlayerState.PAUSE
+                    self._drop_preroll()
                     await self.emit('pause', player=self, entry=self._current)
 
     async def pause(self):
@@ -757,6 +1238,7 @@ class Player(AsyncEventEmitter, Serializable):
                 elif self.state == PlayerState.PLAYING:
                     self._player.pause()
                     self.state = PlayerState.PAUSE
+                    self._drop_preroll()
                     await self.emit('pause', player=self, entry=self._current)
                     return
 
@@ -806,6 +1288,126 @@ class Player(AsyncEventEmitter, Serializable):
             await event.wait()
             return
     
+    def _schedule_preroll(self, entry):
+        if self._preroll_handle:
+            self._preroll_handle.cancel()
+            self._preroll_handle = None
+        if not self._guild._bot.config.gapless_playback or entry.stream or not entry.duration or not self._source:
+            return
+        remaining = entry.duration - self._source.get_progress()
+        self._preroll_handle = self._guild._bot.loop.call_later(
+            max(remaining - _preroll_seconds, 0),
+            lambda: ensure_future(self._preroll(entry))
+        )
+
+    async def _preroll(self, entry):
+        """
+        Start the source of the entry that plays after entry, so that it takes over on the frame
+        after entry ends. Only done for the first entry of the playlist when it is downloaded already.
+        """
+        self._preroll_handle = None
+        if self.random or self.pull_persist:
+            return
+
+        async with self._aiolocks['playlist']:
+            playlist = self._playlist
+            if not playlist or not playlist._list:
+                return
+            next_entry = playlist._list[0]
+
+        cache = next_entry._cache_task
+        if next_entry.stream or not cache or not cache.done() or cache.cancelled() or cache.exception():
+            return
+
+        async with self._aiolocks['player']:
+            if self._current is not entry or not self._chain:
+                return
+
+        source = await self._create_source(next_entry)
+        await self._guild._bot.loop.run_in_executor(None, source.preroll, _preroll_frames)
+
+        async with self._aiolocks['player']:
+            if (
+                self._current is not entry or not self._chain or self.state != PlayerState.PLAYING or
+                self._playlist is not playlist or self.random or self.pull_persist
+            ):
+                source.cleanup()
+                return
+            if self._prerolled:
+                self._prerolled[1].cleanup()
+            self._ensure_encoder(source)
+            self._prerolled = (next_entry, source)
+            self._chain.queue(
+                next_entry,
+                source,
+                lambda: self._playlist is playlist and bool(playlist._list) and playlist._list[0] is next_entry
+            )
+            self._guild._bot.log.debug('prerolled {}'.format(next_entry.title))
+
+    def _ensure_encoder(self, source):
+        if not source.is_opus() and not self._guild._voice_client.encoder:
+            # the voice client only creates an encoder if the first source needs one
+            self._guild._voice_client.encoder = opus.Encoder()
+
+    def _handover_threadsafe(self, entry, source):
+        run_coroutine_threadsafe(self._handover(entry, source), self._guild._bot.loop)
+
+    async def _handover(self, entry, source):
+        """
+        The prerolled entry started playing, finish the previous one the same way playback
+        finishing would have and make entry current, without restarting the voice client.
+        """
+        async with self._aiolocks['playlist']:
+            self._playlist._take_entry(entry)
+
+        async with self._aiolocks['player']:
+            finished = self._current
+            self._prerolled = None
+            self._current = entry
+            self._source = source
+
+        _entry_cleanup(finished, self._guild._bot)
+        await self.emit('finished-playing', player=self, entry=finished)
+        if finished in self._entry_finished_tasks:
+            for task in self._entry_finished_tasks[finished]:
+                await task
+            del self._entry_finished_tasks[finished]
+
+        self.cache_stats['ready'] += 1
+        self.cache_stats['gapless'] += 1
+        if not entry.local and entry._local_url:
+            self._guild._bot.downloader.cache_index.touch(entry._local_url)
+
+        await self.emit('play', player=self, entry=entry)
+        self._schedule_preroll(entry)
+
+    async def seek(self, seconds):
+        """
+        Continue the current entry from seconds into it, by restarting its source there.
+        Return the position actually seeked to.
+        """
+        async with self._aiolocks['player']:
+            entry = self._current
+            if not entry or not self._player or not self._source:
+                raise PlaybackError('nothing is playing!')
+            if entry.stream:
+                raise PlaybackError('cannot seek in a stream')
+            if not entry._local_url or not os.path.isfile(entry._local_url):
+                raise PlaybackError('entry is still being downloaded')
+
+            seconds = max(seconds, 0)
+            if entry.duration:
+                seconds = min(seconds, entry.duration)
+
+            source = await self._create_source(entry, progress=int(seconds * 50))
+            self._ensure_encoder(source)
+            self._chain.replace(source).cleanup()
+            self._source = source
+
+        self._schedule_preroll(entry)
+        await self.emit('seek', player=self, entry=entry, position=seconds)
+        return seconds
+
     async def kill(self):
         async with self._aiolocks['kill']:
             # TODO: destruct
@@ -0,0 +1,87 @@
+"""
+Read-ahead buffer between FFmpeg and the voice client.
+
+discord.py's player thread reads a frame every 20ms. If reading from FFmpeg stalls (slow disk,
+the pipe not being scheduled, GIL contention with youtube_dl threads) that frame is sent late and
+the song stutters. BufferedSource reads from FFmpeg on its own thread into a bounded queue, so the
+player thread only ever takes frames from memory.
+"""
+
+import time
+import queue
+import logging
+import threading
+
+from discord.player import AudioSource
+
+log = logging.getLogger(__name__)
+
+# how long read waits for the buffer to refill before giving up on the source
+_underrun_timeout = 10
+
+class BufferedSource(AudioSource):
+    def __init__(self, original, frames, stats):
+        self.original = original
+        # counters shared by every source of the player, see Player.buffer_stats
+        self.stats = stats
+        self._queue = queue.Queue(frames)
+        self._stop = threading.Event()
+        self._started = False
+        self._ended = False
+        self._thread = threading.Thread(target=self._fill, name='playback_buffer', daemon=True)
+        self._thread.start()
+
+    def is_opus(self):
+        return self.original.is_opus()
+
+    def _put(self, data):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(data, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def _fill(self):
+        data = b''
+        try:
+            while not self._stop.is_set():
+                data = self.original.read()
+                self._put(data)
+                if not data:
+                    return
+        except Exception:
+            if not self._stop.is_set():
+                log.error('Error while reading ahead', exc_info=True)
+        if data:
+            self._put(b'')
+
+    def read(self):
+        if self._ended:
+            return b''
+
+        try:
+            data = self._queue.get_nowait()
+        except queue.Empty:
+            # the very first frame is allowed to need waiting for
+            if self._started:
+                self.stats['underruns'] += 1
+            start = time.perf_counter()
+            try:
+                data = self._queue.get(timeout=_underrun_timeout)
+            except queue.Empty:
+                log.warning('Source did not give any audio in {} seconds, giving up'.format(_underrun_timeout))
+                data = b''
+            if self._started and time.perf_counter() - start > 0.02:
+                self.stats['late_frames'] += 1
+
+        self._started = True
+        self.stats['frames'] += 1
+        self.stats['depth'] = self._queue.qsize()
+        if not data:
+            self._ended = True
+        return data
+
+    def cleanup(self):
+        self._stop.set()
+        self.original.cleanup()
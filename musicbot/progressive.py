@@ -0,0 +1,84 @@
+"""
+Progressive playback: play a song while youtube_dl is still downloading it.
+
+youtube_dl writes the download to a .part file and renames it once finished. GrowingFileFeeder
+follows that file from a thread and copies it into a pipe that FFmpeg reads from, so FFmpeg never
+sees the end of the file before the download actually ended. The renaming does not disturb the
+reader on POSIX as the opened file keeps refering to the same data, which is also why this does not
+work on Windows where an opened file cannot be renamed.
+"""
+
+import os
+import time
+import logging
+import threading
+from asyncio import sleep
+
+log = logging.getLogger(__name__)
+
+supported = os.name != 'nt'
+
+class GrowingFileFeeder:
+    def __init__(self, path, done, *, chunk_size=65536, poll_interval=0.1):
+        self.path = path
+        # threading.Event set when the writer finished (successfully or not)
+        self.done = done
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.fed = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Open the file and start feeding it. Return file object of the read end of the pipe
+        which should be given to FFmpeg as stdin and closed afterwards.
+        """
+        infile = open(self.path, 'rb')
+        rfd, wfd = os.pipe()
+        self._thread = threading.Thread(
+            target=self._feed,
+            args=(infile, os.fdopen(wfd, 'wb')),
+            name='progressive_feeder',
+            daemon=True
+        )
+        self._thread.start()
+        return os.fdopen(rfd, 'rb')
+
+    def stop(self):
+        self._stop.set()
+
+    def _feed(self, infile, pipe):
+        try:
+            with infile, pipe:
+                while not self._stop.is_set():
+                    # check before reading so that data written just before finishing is not lost
+                    finished = self.done.is_set()
+                    data = infile.read(self.chunk_size)
+                    if data:
+                        pipe.write(data)
+                        self.fed += len(data)
+                    elif finished:
+                        break
+                    else:
+                        time.sleep(self.poll_interval)
+        except (BrokenPipeError, ValueError):
+            # FFmpeg went away, probably skipped
+            pass
+        except Exception:
+            log.error('Error while feeding {} to FFmpeg'.format(self.path), exc_info=True)
+
+async def wait_initial_buffer(entry, cache, size, *, poll_interval=0.1):
+    """
+    Wait until the entry's download have written at least size bytes and return the path being
+    written to, or return None if the download finished (or never started) before that.
+    """
+    while not cache.done():
+        path = entry._progressive_path
+        if path:
+            try:
+                if os.path.getsize(path) >= size:
+                    return path
+            except OSError:
+                pass
+        await sleep(poll_interval)
@@ -366,7 +366,7 @@ class RichGuild(Serializable):
                     self._bot.log.debug("Created player via deserialization for guild %s with %s entries", self._id, len(player._playlist._list) if player._playlist else 0)
             
             if not player:
-                player = Player(self)
+                player = Player(self, volume=self._bot.config.default_volume)
 
             if not player._playlist:
                 pl = Playlist('default-{}'.format(self._id), self._bot)
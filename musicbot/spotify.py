@@ -1,16 +1,57 @@
 import aiohttp
 import asyncio
 import base64
+import json
 import logging
+import os
 import time
 
 from .exceptions import SpotifyError
 
 log = logging.getLogger(__name__)
 
+class TokenBucket:
+    """
+    Allow rate requests per second on average with bursts of up to capacity requests.
+    Everyone waits when the server told us to back off.
+    """
+    def __init__(self, rate, capacity, loop):
+        self.rate = rate
+        self.capacity = capacity
+        self.loop = loop
+        self._tokens = capacity
+        self._last = loop.time()
+        self._blocked_until = 0
+        self._lock = asyncio.Lock()
+
+    def block(self, seconds):
+        self._blocked_until = max(self._blocked_until, self.loop.time() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = self.loop.time()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
 class Spotify:
     OAUTH_TOKEN_URL = 'https://accounts.spotify.com/api/token'
     API_BASE = 'https://api.spotify.com/v1/'
+    TOKEN_FILE = 'data/spotify_token.json'
+    # maximum number of ids per request of the batch endpoints
+    BATCH_LIMITS = {'tracks': 50, 'albums': 20}
+    # how long get_track and get_album wait for other requests to batch with
+    BATCH_DELAY = 0.05
+    MAX_RETRIES = 5
 
     def __init__(self, client_id, client_secret, aiosession=None, loop=None):
         self.client_id = client_id
@@ -21,16 +62,136 @@ class Spotify:
         self.loop = loop if loop else asyncio.get_event_loop()
 
         self.token = None
+        self._bucket = TokenBucket(10, 20, self.loop)
+        # kind -> {id: [futures]} of single object requests waiting to be batched
+        self._batches = dict()
 
+        self.load_token()
         self.loop.run_until_complete(self.get_token())  # validate token
 
+    def _token_owner(self):
+        return 'guest' if self.guest_mode else self.client_id
+
+    def load_token(self):
+        """Load the token saved by previous run, if it belongs to the same client"""
+        if not os.path.isfile(self.TOKEN_FILE):
+            return
+
+        try:
+            with open(self.TOKEN_FILE, 'r', encoding='utf8') as f:
+                data = json.load(f)
+        except Exception:
+            log.warning('Could not load saved Spotify token from {}'.format(self.TOKEN_FILE), exc_info=True)
+            return
+
+        if data.get('owner') == self._token_owner():
+            self.token = data.get('token')
+
+    def save_token(self):
+        os.makedirs(os.path.dirname(self.TOKEN_FILE), exist_ok=True)
+        try:
+            with open(self.TOKEN_FILE, 'w', encoding='utf8') as f:
+                json.dump({'owner': self._token_owner(), 'token': self.token}, f)
+        except Exception:
+            log.warning('Could not save Spotify token to {}'.format(self.TOKEN_FILE), exc_info=True)
+
     async def get_track(self, uri):
         """Get a track's info from its URI"""
-        return await self.make_spotify_req(self.API_BASE + 'tracks/{0}'.format(uri))
+        return await self._get_batched('tracks', uri)
 
     async def get_album(self, uri):
         """Get an album's info from its URI"""
-        return await self.make_spotify_req(self.API_BASE + 'albums/{0}'.format(uri))
+        return await self._get_batched('albums', uri)
+
+    async def get_tracks(self, uris):
+        """Get info of several tracks, in the same order"""
+        return await self._get_several('tracks', uris)
+
+    async def get_albums(self, uris):
+        """Get info of several albums, in the same order"""
+        return await self._get_several('albums', uris)
+
+    async def _get_several(self, kind, uris):
+        limit = self.BATCH_LIMITS[kind]
+        chunks = [uris[i:i + limit] for i in range(0, len(uris), limit)]
+        results = await asyncio.gather(*(
+            self.make_spotify_req(self.API_BASE + '{0}?ids={1}'.format(kind, ','.join(chunk))) for chunk in chunks
+        ))
+        return [item for result in results for item in result[kind]]
+
+    async def _get_batched(self, kind, uri):
+        """Wait a little for other requests of the same kind so that they can share one request"""
+        future = self.loop.create_future()
+        pending = self._batches.get(kind)
+        if pending is None:
+            pending = self._batches[kind] = dict()
+            self.loop.call_later(self.BATCH_DELAY, lambda: asyncio.ensure_future(self._flush_batch(kind), loop=self.loop))
+        pending.setdefault(uri, []).append(future)
+        return await future
+
+    async def _flush_batch(self, kind):
+        pending = self._batches.pop(kind)
+        try:
+            await self._answer_batch(kind, pending)
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+        finally:
+            # e.g. cancelled, nobody may be left waiting
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.cancel()
+
+    async def _answer_batch(self, kind, pending):
+        uris = list(pending.keys())
+        try:
+            results = await self._get_several(kind, uris)
+        except SpotifyError as e:
+            if len(uris) == 1:
+                for future in pending[uris[0]]:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            # one bad id fails the whole batch, do them one by one so that only that one fails
+            results = await asyncio.gather(*(
+                self.make_spotify_req(self.API_BASE + '{0}/{1}'.format(kind, uri)) for uri in uris
+            ), return_exceptions=True)
+
+        for uri, result in zip(uris, results):
+            for future in pending[uri]:
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                elif result is None:
+                    future.set_exception(SpotifyError('Spotify does not know {0} {1}'.format(kind[:-1], uri)))
+                else:
+                    future.set_result(result)
+
+    async def _get_all_pages(self, url, first, limit):
+        """Get remaining pages of a paging object concurrently, knowing the total from the first page"""
+        items = list(first['items'])
+        offsets = range(len(first['items']), first['total'], limit)
+        pages = await asyncio.gather(*(
+            self.make_spotify_req('{0}{1}offset={2}&limit={3}'.format(url, '&' if '?' in url else '?', offset, limit)) for offset in offsets
+        ))
+        for page in pages:
+            items.extend(page['items'])
+        return items
+
+    async def get_album_tracks(self, uri):
+        """Get all tracks of an album, albums only come with their first 50 tracks"""
+        album = await self.get_album(uri)
+        return await self._get_all_pages(self.API_BASE + 'albums/{0}/tracks'.format(uri), album['tracks'], 50)
+
+    async def get_all_playlist_tracks(self, uri):
+        """Get all items of a playlist, requesting the pages concurrently"""
+        url = self.API_BASE + 'playlists/{0}/tracks?fields=total,items(track(id,name,artists(name),duration_ms))'.format(uri)
+        first = await self.make_spotify_req('{0}&offset=0&limit=100'.format(url))
+        return await self._get_all_pages(url, first, 100)
 
     async def get_playlist(self, user, uri):
         """Get a playlist's info from its URI"""
@@ -46,11 +207,20 @@ class Spotify:
         return await self.make_get(url, headers={'Authorization': 'Bearer {0}'.format(token)})
 
     async def make_get(self, url, headers=None):
-        """Makes a GET request and returns the results"""
-        async with self.aiosession.get(url, headers=headers) as r:
-            if r.status != 200:
-                raise SpotifyError('Issue making GET request to {0}: [{1.status}] {2}'.format(url, r, await r.json()))
-            return await r.json()
+        """Makes a GET request and returns the results, waiting and retrying when rate limited"""
+        for attempt in range(self.MAX_RETRIES):
+            await self._bucket.acquire()
+            async with self.aiosession.get(url, headers=headers) as r:
+                if r.status == 429:
+                    retry_after = float(r.headers.get('Retry-After', 1))
+                    log.debug('Rate limited by Spotify, retrying in {0} seconds'.format(retry_after))
+                    self._bucket.block(retry_after)
+                    continue
+                if r.status != 200:
+                    raise SpotifyError('Issue making GET request to {0}: [{1.status}] {2}'.format(url, r, await r.json()))
+                return await r.json()
+
+        raise SpotifyError('Still rate limited by Spotify after {0} attempts: {1}'.format(self.MAX_RETRIES, url))
 
     async def make_post(self, url, payload, headers=None):
         """Makes a POST request and returns the results"""
@@ -79,6 +249,7 @@ class Spotify:
             token['expires_at'] = int(time.time()) + token['expires_in']
             self.token = token
         log.debug('Created a new {0}access token: {1}'.format("guest " if self.guest_mode else "", self.token))
+        self.save_token()
         return self.token['access_token']
 
     async def check_token(self, token):
@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import logging
+from collections import Counter
+
+log = logging.getLogger(__name__)
+
+class SpotifyMatchStore:
+    """
+    Persistent mapping of Spotify track id to the YouTube video found when searching for it,
+    so that queueing a known track does not need another search. Matches older than max_age
+    are still used but should be revalidated.
+    """
+    def __init__(self, path, max_age):
+        self.path = path
+        self.max_age = max_age
+        self._matches = dict()
+        self._save_handle = None
+        self.stats = Counter()
+        # track ids currently being revalidated
+        self.revalidating = set()
+
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.path):
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf8') as f:
+                self._matches = json.load(f)
+        except Exception:
+            log.warning('Could not load Spotify matches from {}, starting with no matches'.format(self.path), exc_info=True)
+            return
+
+        log.debug('Loaded {} Spotify matches'.format(len(self._matches)))
+
+    def save(self):
+        self._save_handle = None
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            with open(self.path, 'w', encoding='utf8') as f:
+                json.dump(self._matches, f)
+        except Exception:
+            log.warning('Could not save Spotify matches to {}'.format(self.path), exc_info=True)
+
+    def schedule_save(self, loop, delay=60):
+        if not self._save_handle:
+            self._save_handle = loop.call_later(delay, self.save)
+
+    def lookup(self, track_ids):
+        """
+        Return dict of track id to match for all given track ids that have one.
+        """
+        found = {track_id: self._matches[track_id] for track_id in track_ids if track_id in self._matches}
+        self.stats['hit'] += len(found)
+        self.stats['miss'] += len(track_ids) - len(found)
+        return found
+
+    def is_stale(self, match):
+        return self.max_age > 0 and time.time() - match['time'] >= self.max_age
+
+    def put(self, track_id, url, title, duration):
+        self._matches[track_id] = {
+            'url': url,
+            'title': title,
+            'duration': duration,
+            'time': time.time()
+        }
+
+    def refresh(self, track_id):
+        if track_id in self._matches:
+            self._matches[track_id]['time'] = time.time()
+
+    def remove(self, track_id):
+        self._matches.pop(track_id, None)
+
+    def get_stats(self):
+        return dict(self.stats, matches=len(self._matches))
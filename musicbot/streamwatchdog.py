@@ -0,0 +1,182 @@
+"""
+Restarting live streams that stop giving audio.
+
+FFmpeg reconnects to HTTP streams by itself when started with the reconnect options, but that
+does not help when the url expired or the server stops sending without closing the connection.
+StreamWatchdog reads the stream on its own thread. When FFmpeg ends or the stream gives nothing
+for a while, the url gets resolved again and a new FFmpeg started, backing off between attempts.
+The voice client gets silence in the meantime instead of the entry ending.
+"""
+
+import time
+import queue
+import logging
+import threading
+
+from discord import opus
+from discord.player import AudioSource
+
+log = logging.getLogger(__name__)
+
+_silence = b'\0' * opus.Encoder.FRAME_SIZE
+# seconds to wait before restarting, doubling after every restart that got no audio
+_backoff_start = 1
+_backoff_max = 30
+# finite media ending this close to its duration counts as played to the end
+_duration_slack = 2
+
+class StreamWatchdog(AudioSource):
+    """
+    PCM AudioSource playing what create(url) returns. resolve() is called from the reading thread
+    to get a fresh url before every restart. stall_seconds is how long the stream may give nothing
+    before it is restarted, max_restarts how many restarts in a row without audio are tried before
+    giving up. stats are counters shared by every stream of the player.
+
+    live and duration are what youtube_dl told about the stream. Ending by itself is only taken
+    as the end of the entry for media that is not live or that played for its whole duration,
+    live streams and ones nothing is known about get restarted.
+    """
+    def __init__(self, url, create, resolve, buffer_frames, stall_seconds, max_restarts, stats, live=None, duration=None):
+        self._create = create
+        self._resolve = resolve
+        self._stall_seconds = stall_seconds
+        self._max_restarts = max_restarts
+        self.stats = stats
+        self._queue = queue.Queue(max(buffer_frames, 1))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._live = live
+        self._duration = duration
+        self._source = create(url)
+        # frames the current source gave
+        self._frames = 0
+        # set when read killed the source for stalling, so that its end is not taken as the real end
+        self._stalled = False
+        self._ended = False
+        # when read first found nothing to give
+        self._empty_since = None
+        self.restarting = False
+        # of this stream
+        self.reconnects = 0
+        self.stalls = 0
+        self.backoff = 0
+        self._thread = threading.Thread(target=self._run, name='stream_watchdog', daemon=True)
+        self._thread.start()
+
+    def _put(self, data):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(data, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def _pump(self, source):
+        """
+        Read source until it ends, return whether it gave any audio and whether it ended by itself
+        rather than by an error or stalling.
+        """
+        produced = False
+        try:
+            while not self._stop.is_set():
+                data = source.read()
+                if not data:
+                    return produced, not self._stalled
+                produced = True
+                self._frames += 1
+                self._put(data)
+        except Exception:
+            if not self._stop.is_set():
+                log.warning('Error while reading stream', exc_info=True)
+        return produced, False
+
+    def _finished(self):
+        if self._live is False:
+            return True
+        return bool(self._duration) and self._frames * 0.02 >= self._duration - _duration_slack
+
+    def _run(self):
+        failures = 0
+        source = self._source
+        while not self._stop.is_set():
+            if source:
+                produced, ended = self._pump(source)
+                source.cleanup()
+                if produced:
+                    failures = 0
+                    self.backoff = 0
+                    if ended and self._finished():
+                        break
+            if self._stop.is_set():
+                break
+
+            failures += 1
+            if failures > self._max_restarts:
+                log.warning('Stream did not recover after {} restarts, giving up'.format(self._max_restarts))
+                self.stats['stream_gave_up'] += 1
+                break
+
+            self.restarting = True
+            self.backoff = min(_backoff_start * 2 ** (failures - 1), _backoff_max)
+            log.info('Stream stopped, restarting in {} seconds (attempt {})'.format(self.backoff, failures))
+            if self._stop.wait(self.backoff):
+                break
+
+            source = None
+            try:
+                source = self._create(self._resolve())
+            except Exception:
+                log.warning('Could not restart stream', exc_info=True)
+            with self._lock:
+                self._source = source
+                self._frames = 0
+                self._stalled = False
+            self.reconnects += 1
+            self.stats['stream_reconnects'] += 1
+            self._empty_since = None
+            self.restarting = False
+
+        self._put(b'')
+
+    def read(self):
+        if self._ended:
+            return b''
+
+        try:
+            data = self._queue.get(timeout=0.02)
+        except queue.Empty:
+            now = time.monotonic()
+            if self._empty_since is None:
+                self._empty_since = now
+            elif not self.restarting and now - self._empty_since > self._stall_seconds:
+                # stuck in reading, killing ffmpeg makes the thread see the end and restart it
+                self.stalls += 1
+                self.stats['stream_stalls'] += 1
+                self._empty_since = None
+                log.info('Stream gave no audio for {} seconds'.format(self._stall_seconds))
+                with self._lock:
+                    source = self._source
+                    self._stalled = True
+                if source:
+                    source.cleanup()
+            return _silence
+
+        self._empty_since = None
+        if not data:
+            self._ended = True
+        return data
+
+    def get_stats(self):
+        return {
+            'reconnects': self.reconnects,
+            'stalls': self.stalls,
+            'backoff': self.backoff,
+            'restarting': self.restarting
+        }
+
+    def cleanup(self):
+        self._stop.set()
+        with self._lock:
+            source = self._source
+        if source:
+            source.cleanup()
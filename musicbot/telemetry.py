@@ -0,0 +1,158 @@
+"""
+Per-guild audio pipeline telemetry.
+
+SourcePlaybackCounter reports every frame it hands to the voice client. PlaybackTelemetry keeps
+totals and a rolling window of the last minute (in 10 second slots) of those frames: a histogram
+of the time between reads, how many frames were empty or short and how many reads were slow.
+It also keeps time-to-first-frame of recent entries, and can report CPU and memory usage of the
+FFmpeg process currently playing. Frames are recorded from the player thread, so recording only
+does a few additions.
+"""
+
+import os
+import time
+from bisect import bisect_left
+from collections import deque
+
+# optionally using psutil for process usage if presents, /proc is read otherwise
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# upper bounds of the inter-frame histogram buckets in milliseconds, the last one is unbounded
+INTERVAL_BUCKETS = (5, 10, 15, 20, 25, 30, 40, 60, 100, 200)
+
+_slot_seconds = 10
+_window_slots = 6
+_first_frame_history = 20
+
+class _FrameStats:
+    __slots__ = ('frames', 'empty', 'short', 'slow_reads', 'histogram')
+
+    def __init__(self):
+        self.frames = 0
+        self.empty = 0
+        self.short = 0
+        self.slow_reads = 0
+        self.histogram = [0] * (len(INTERVAL_BUCKETS) + 1)
+
+    def add(self, other):
+        self.frames += other.frames
+        self.empty += other.empty
+        self.short += other.short
+        self.slow_reads += other.slow_reads
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def to_dict(self):
+        return {
+            'frames': self.frames,
+            'empty_frames': self.empty,
+            'short_frames': self.short,
+            'slow_reads': self.slow_reads,
+            'interval_histogram': {
+                ('<={}ms'.format(bound) if idx < len(INTERVAL_BUCKETS) else '>{}ms'.format(INTERVAL_BUCKETS[-1])): count
+                for idx, (bound, count) in enumerate(zip(INTERVAL_BUCKETS + (None,), self.histogram))
+            }
+        }
+
+class PlaybackTelemetry:
+    def __init__(self):
+        self.totals = _FrameStats()
+        # (perf_counter time it started, _FrameStats) of the latest slots
+        self._slots = deque(maxlen=_window_slots)
+        self._last_read = None
+        # (title, seconds) of the latest entries
+        self.first_frames = deque(maxlen=_first_frame_history)
+        # pid -> (wall time, cpu seconds) of the last usage query, to get usage since then
+        self._cpu_samples = dict()
+
+    def record_frame(self, read_start, read_end, size, frame_size):
+        """
+        Record a read that started and ended at the given perf_counter times and returned size
+        bytes, frame_size is the expected size of a full frame or None for opus.
+        """
+        if not self._slots or read_end - self._slots[-1][0] >= _slot_seconds:
+            self._slots.append((read_end, _FrameStats()))
+        slot = self._slots[-1][1]
+
+        for stats in (self.totals, slot):
+            stats.frames += 1
+            if not size:
+                stats.empty += 1
+            elif frame_size and size < frame_size:
+                stats.short += 1
+            if read_end - read_start > 0.02:
+                stats.slow_reads += 1
+
+        if self._last_read is not None:
+            bucket = bisect_left(INTERVAL_BUCKETS, (read_start - self._last_read) * 1000)
+            self.totals.histogram[bucket] += 1
+            slot.histogram[bucket] += 1
+        self._last_read = read_start
+
+    def reset_interval(self):
+        """
+        Do not count time spent paused or between entries as an interval between frames.
+        """
+        self._last_read = None
+
+    def record_first_frame(self, title, seconds):
+        self.first_frames.append((title, seconds))
+
+    def window(self):
+        stats = _FrameStats()
+        oldest = time.perf_counter() - _slot_seconds * _window_slots
+        for start, slot in list(self._slots):
+            if start >= oldest:
+                stats.add(slot)
+        return stats
+
+    def process_usage(self, pid):
+        """
+        CPU (percent of one core since the last query) and RSS of a process, or None.
+        """
+        now = time.monotonic()
+        try:
+            if psutil:
+                process = psutil.Process(pid)
+                with process.oneshot():
+                    times = process.cpu_times()
+                    cpu = times.user + times.system
+                    rss = process.memory_info().rss
+                    started = process.create_time() - time.time() + now
+            else:
+                with open('/proc/{}/stat'.format(pid)) as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                ticks = os.sysconf('SC_CLK_TCK')
+                cpu = (int(fields[11]) + int(fields[12])) / ticks
+                with open('/proc/uptime') as f:
+                    uptime = float(f.read().split()[0])
+                started = now - (uptime - int(fields[19]) / ticks)
+                with open('/proc/{}/statm'.format(pid)) as f:
+                    rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except Exception:
+            return None
+
+        last_time, last_cpu = self._cpu_samples.get(pid, (started, 0.0))
+        self._cpu_samples = {pid: (now, cpu)}
+        elapsed = now - last_time
+        return {
+            'pid': pid,
+            'cpu_percent': round(100 * (cpu - last_cpu) / elapsed, 1) if elapsed > 0 else None,
+            'cpu_seconds': round(cpu, 2),
+            'rss': rss
+        }
+
+    def get_stats(self, process=None):
+        first_frames = [seconds for _, seconds in self.first_frames]
+        return {
+            'total': self.totals.to_dict(),
+            'last_minute': self.window().to_dict(),
+            'first_frame': {
+                'latest': [{'title': title, 'seconds': round(seconds, 3)} for title, seconds in self.first_frames],
+                'average': round(sum(first_frames) / len(first_frames), 3) if first_frames else None,
+                'max': round(max(first_frames), 3) if first_frames else None
+            },
+            'ffmpeg': self.process_usage(process.pid) if process and process.poll() is None else None
+        }
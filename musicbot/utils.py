@@ -96,6 +96,23 @@ def md5sum(filename, limit=0):
             fhash.update(chunk)
     return fhash.hexdigest()[-limit:]
 
+_size_units = {'': 1, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024**2, 'mb': 1024**2, 'g': 1024**3, 'gb': 1024**3, 't': 1024**4, 'tb': 1024**4}
+
+def parse_size(size):
+    """
+    Parse human readable size such as 500M or 10GB into bytes.
+    """
+    size = str(size).strip().lower()
+    num = size.rstrip('kmgtb')
+    return int(float(num) * _size_units[size[len(num):].strip()])
+
+def format_size(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(size) < 1024:
+            return '{}{}'.format(fixg(size), unit)
+        size /= 1024
+    return '{}TiB'.format(fixg(size))
+
 def fixg(x, dp=2):
     return ('{:.%sf}' % dp).format(x).rstrip('0').rstrip('.')
 
@@ -105,6 +122,16 @@ def ftimedelta(td):
     return ':'.join([p1, '{:02d}'.format(int(float(p2)))])
 
 
+def parse_time(time):
+    """
+    Parse time such as 90, 1:30 or 1:02:30 into seconds.
+    """
+    seconds = 0
+    for part in str(time).strip().split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
 def safe_print(content, *, end='\n', flush=True):
     sys.stdout.buffer.write((content + end).encode('utf-8', 'replace'))
     if flush: sys.stdout.flush()
@@ -50,18 +50,38 @@ DEALINGS IN THE SOFTWARE.
 """
 
 import os
+import time
 import asyncio
+import logging
+import threading
 import functools
 import youtube_dl
+from collections import Counter, deque
+from copy import deepcopy
+from itertools import islice
 from .exceptions import VersionError, ExtractionError
-from .playback import Entry
-from .utils import get_header, md5sum, run_command
+from .playback import Entry, url_map
+from .infocache import InfoCache, SearchCache, parse_search, url_expiry, trim_info
+from .audiocache import AudioCacheIndex, AudioCacheEvictor
+from .ytdlworker import ExtractorProcessPool
+from .utils import get_header, md5sum, get_command
+from .ffmpegoptions import measure_loudness, transcode_to_opus
+from .lib.opusdemux import is_opus_file
+from .lib.mediaduration import get_duration
 
 from urllib.error import URLError
 from youtube_dl.utils import DownloadError, UnsupportedError
 
 from concurrent.futures import ThreadPoolExecutor
 
+# optionally using pymediainfo as a fallback if presents
+try:
+    import pymediainfo
+except:
+    pymediainfo = None
+
+log = logging.getLogger(__name__)
+
 ytdl_format_options = {
     'format': 'bestaudio/best',
     'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
@@ -98,28 +118,273 @@ youtube_dl.utils.bug_reports_message = lambda: ''
 class YtdlDownloader:
     def __init__(self, bot, download_folder=None):
         self._bot = bot
-        self.thread_pool = ThreadPoolExecutor(max_workers=2)
-        self.unsafe_ytdl = youtube_dl.YoutubeDL(ytdl_format_options)
-        self.safe_ytdl = youtube_dl.YoutubeDL(ytdl_format_options)
-        self.safe_ytdl.params['ignoreerrors'] = True
+        # metadata lookups and downloads get their own lanes so a long download cannot hold up quick lookups
+        self.thread_pool = ThreadPoolExecutor(max_workers=self._bot.config.extractor_threads)
+        self.download_pool = ThreadPoolExecutor(max_workers=self._bot.config.download_threads)
         os.makedirs(download_folder, exist_ok=True)
         self.download_folder = download_folder
+        self.cache_index = AudioCacheIndex(download_folder, 'data/audio_cache_index.json')
+        self.cache_evictor = AudioCacheEvictor(
+            self.cache_index,
+            self._bot.config.storage_limit,
+            self._bot.config.cache_eviction_policy,
+            self._cache_pinned
+        )
+        # YoutubeDL objects are not thread-safe, every worker thread lazily creates its own pair
+        self._thread_ytdl = threading.local()
+        # these are only used on the event loop thread (prepare_filename etc.)
+        self.unsafe_ytdl = self._make_ytdl(safe=False)
+        self.safe_ytdl = self._make_ytdl(safe=True)
+        # optionally run youtube_dl in killable worker processes instead of in the executor threads directly
+        self._process_pool = None
+        if self._bot.config.extractor_isolation:
+            self._process_pool = ExtractorProcessPool(
+                {safe: self._ytdl_params(safe=safe) for safe in (False, True)},
+                self._bot.config.extractor_max_jobs
+            )
+        self.info_cache = InfoCache('data/ytdl_info_cache.json', self._bot.config.info_cache_ttl, self._bot.config.info_cache_size)
+        # search results change over time, they are only kept in memory and for a shorter time
+        self.search_cache = SearchCache(self._bot.config.search_cache_ttl, self._bot.config.search_cache_size)
+        # extractions currently running in the threadpool, so that identical concurrent requests can share them
+        # key -> [future, how many requests joined it]
+        self._inflight = dict()
+        # loudness measurements running in the background, keyed by file path
+        self._loudness_tasks = dict()
+        self._loudness_semaphore = None
+        self.stats = Counter()
+
+    def _cache_pinned(self):
+        """
+            Files of entries that are queued or playing, these must stay in the cache.
+        """
+        return {os.path.basename(path) for path, entries in url_map.items() if entries}
+
+    def _ytdl_params(self, *, safe):
+        params = dict(ytdl_format_options)
+        if safe:
+            params['ignoreerrors'] = True
 
         if self.download_folder:
-            otmpl = self.unsafe_ytdl.params['outtmpl']
-            self.unsafe_ytdl.params['outtmpl'] = os.path.join(self.download_folder, otmpl)
+            otmpl = params['outtmpl']
+            params['outtmpl'] = os.path.join(self.download_folder, otmpl)
             # print("setting template to " + os.path.join(self.download_folder, otmpl))
 
-            otmpl = self.safe_ytdl.params['outtmpl']
-            self.safe_ytdl.params['outtmpl'] = os.path.join(self.download_folder, otmpl)
+        return params
+
+    def _make_ytdl(self, *, safe):
+        return youtube_dl.YoutubeDL(self._ytdl_params(safe=safe))
+
+    def _thread_extract_info(self, safe, *args, **kwargs):
+        """
+            Runs in a worker thread, using YoutubeDL objects (or a worker process) owned by that thread.
+        """
+        if self._process_pool:
+            if kwargs.get('download', True):
+                timeout = self._bot.config.download_timeout
+            else:
+                timeout = self._bot.config.extractor_timeout
+            return self._process_pool.run(timeout, safe, *args, **kwargs)
+
+        attr = 'safe_ytdl' if safe else 'unsafe_ytdl'
+        ytdl = getattr(self._thread_ytdl, attr, None)
+        if not ytdl:
+            ytdl = self._make_ytdl(safe=safe)
+            setattr(self._thread_ytdl, attr, ytdl)
+        info = ytdl.extract_info(*args, **kwargs)
+        if lazy_entries(info):
+            # the entries generator keeps using this YoutubeDL when advanced from whatever thread
+            # PagedEntries is on, so it goes with the playlist and this thread makes a new one
+            setattr(self._thread_ytdl, attr, None)
+        return info
 
     def shutdown(self):
         self.thread_pool.shutdown()
+        self.download_pool.shutdown()
+        if self._process_pool:
+            self._process_pool.shutdown()
+        self.info_cache.save()
+        self.cache_index.save()
 
     @property
     def ytdl(self):
         return self.safe_ytdl
 
+    def get_stats(self):
+        return dict(
+            self.stats,
+            inflight=len(self._inflight),
+            audio_cache_files=len(self.cache_index),
+            audio_cache_bytes=self.cache_index.total_size(),
+            audio_cache_evicted=self.cache_evictor.evicted,
+            audio_cache_evicted_bytes=self.cache_evictor.evicted_bytes
+        )
+
+    async def convert_to_opus(self, path):
+        """
+            Convert a download to opus once so that it can be played without transcoding,
+            unless it already is opus. Return path of the file to use.
+        """
+        if await self._bot.loop.run_in_executor(None, is_opus_file, path):
+            return path
+
+        destination = path.rsplit('.', 1)[0] + '.opus'
+        if destination == path:
+            return path
+
+        if not await transcode_to_opus(path, destination, self._bot.log):
+            if os.path.isfile(destination):
+                os.unlink(destination)
+            return path
+
+        os.unlink(path)
+        self.stats['opus_converted'] += 1
+        return destination
+
+    def get_loudness(self, path):
+        """
+            Loudness measurements of a cached file, or None if it has not been measured (yet).
+        """
+        record = self.cache_index.get(path)
+        return record.get('loudness') if record else None
+
+    def schedule_loudness(self, path):
+        """
+            Measure loudness of a cached file in the background so that equalization does not
+            need to analyse it right before playing, unless it is already measured.
+        """
+        if not self._bot.config.use_experimental_equalization:
+            return
+        record = self.cache_index.get(path)
+        if record is None or 'loudness' in record or path in self._loudness_tasks:
+            return
+        self._loudness_tasks[path] = asyncio.ensure_future(self._measure_loudness(path))
+
+    async def _measure_loudness(self, path):
+        # analysis decodes the whole file, measure one at a time to leave cpu for playback
+        if not self._loudness_semaphore:
+            self._loudness_semaphore = asyncio.Semaphore(1)
+        try:
+            async with self._loudness_semaphore:
+                loudness = await measure_loudness(path, self._bot.log)
+            if not loudness:
+                # not stored, so it is measured again next time
+                self.stats['loudness_failed'] += 1
+                self._bot.log.warning('Could not measure loudness of {}, it will not be equalised using measurements.'.format(path))
+                return
+            self.cache_index.update(path, loudness=loudness)
+            self.cache_index.schedule_save(self._bot.loop)
+            self.stats['loudness_measured'] += 1
+        except Exception:
+            self.stats['loudness_failed'] += 1
+            self._bot.log.error(
+                'There as a problem with working out EQ of {}, likely caused by a strange installation of FFmpeg. '
+                'This has not impacted the ability for the bot to work, but will mean this track will not be equalised '
+                'using measurements.'.format(path),
+                exc_info=True
+            )
+        finally:
+            del self._loudness_tasks[path]
+
+    def _cacheable(self, args, kwargs):
+        """
+            Only metadata lookup of a single url can be answered from the info cache.
+        """
+        return (
+            len(args) == 1 and isinstance(args[0], str) and
+            kwargs.get('download', True) is False and
+            set(kwargs.keys()) <= {'download', 'process'}
+        )
+
+    @staticmethod
+    def _inflight_key(safe, args, kwargs):
+        key = (safe, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    async def _run_extract(self, safe, *args, use_cache=True, **kwargs):
+        """
+            With use_cache False the extraction is always done again, its result still replaces
+            what is cached.
+        """
+        cacheable = self._cacheable(args, kwargs)
+        searchable = cacheable and parse_search(args[0]) is not None
+        if searchable:
+            cacheable = False
+            # only processed search results contain everything needed from the results
+            searchable = kwargs.get('process', True)
+
+        if searchable and use_cache:
+            info = self.search_cache.get(args[0])
+            if info:
+                self.stats['search_cache_hit'] += 1
+                self._bot.log.debug('Search cache hit: {}'.format(args[0]))
+                return info
+            self.stats['search_cache_miss'] += 1
+
+        if cacheable and use_cache:
+            info = self.info_cache.get(args[0], kwargs.get('process', True))
+            if info:
+                self.stats['info_cache_hit'] += 1
+                self._bot.log.debug('Extraction info cache hit: {}'.format(args[0]))
+                return info
+            self.stats['info_cache_miss'] += 1
+
+        def _trimmed(info):
+            # give the same fields a cache hit would
+            if (cacheable or searchable) and info:
+                trimmed = trim_info(info)
+                if trimmed is not None:
+                    return trimmed
+            return info
+
+        key = self._inflight_key(safe, args, kwargs)
+        if key is not None and key in self._inflight and use_cache:
+            self.stats['inflight_hit'] += 1
+            self._bot.log.debug('Joining in-flight extraction: {}'.format(args))
+            inflight = self._inflight[key]
+            inflight[1] += 1
+            # shield so that a cancelled waiter does not cancel the extraction for everyone else
+            info = await asyncio.shield(inflight[0])
+            if lazy_entries(info):
+                # the entries generator of a playlist can only be consumed once, get one of our own
+                return await self._run_extract(safe, *args, use_cache=False, **kwargs)
+            # the requests sharing the extraction each get a copy of their own
+            return _trimmed(deepcopy(info))
+
+        self.stats['inflight_miss'] += 1
+        pool = self.download_pool if kwargs.get('download', True) else self.thread_pool
+        future = self._bot.loop.run_in_executor(pool, functools.partial(self._thread_extract_info, safe, *args, **kwargs))
+        inflight = [future, 0]
+
+        if key is not None:
+            self._inflight[key] = inflight
+
+            def _done(fut):
+                # a request bypassing the cache may have started an identical one meanwhile
+                if self._inflight.get(key) is inflight:
+                    del self._inflight[key]
+                if not fut.cancelled():
+                    # mark exception as retrieved, waiters that are still around will get it anyway
+                    fut.exception()
+
+            future.add_done_callback(_done)
+
+        info = await asyncio.shield(future)
+        if inflight[1] and not lazy_entries(info):
+            # nobody joins after the extraction finished, the ones that did copy this same dict
+            info = deepcopy(info)
+
+        if cacheable and self.info_cache.put(args[0], kwargs.get('process', True), info):
+            self.info_cache.schedule_save(self._bot.loop)
+
+        if searchable:
+            self.search_cache.put(args[0], info)
+
+        return _trimmed(info)
+
     async def extract_info(self, *args, on_error=None, retry_on_error=False, **kwargs):
         """
             Runs ytdl.extract_info within the threadpool. Returns a future that will fire when it's done.
@@ -128,7 +393,7 @@ class YtdlDownloader:
         """
         if callable(on_error):
             try:
-                return await self._bot.loop.run_in_executor(self.thread_pool, functools.partial(self.unsafe_ytdl.extract_info, *args, **kwargs))
+                return await self._run_extract(False, *args, **kwargs)
 
             except Exception as e:
 
@@ -144,12 +409,12 @@ class YtdlDownloader:
                     self._bot.loop.call_soon_threadsafe(on_error, e)
 
                 if retry_on_error:
-                    return await self.safe_extract_info(self._bot.loop, *args, **kwargs)
+                    return await self.safe_extract_info(*args, **kwargs)
         else:
-            return await self._bot.loop.run_in_executor(self.thread_pool, functools.partial(self.unsafe_ytdl.extract_info, *args, **kwargs))
+            return await self._run_extract(False, *args, **kwargs)
 
     async def safe_extract_info(self, *args, **kwargs):
-        return await self._bot.loop.run_in_executor(self.thread_pool, functools.partial(self.safe_ytdl.extract_info, *args, **kwargs))
+        return await self._run_extract(True, *args, **kwargs)
 
     async def process_url_to_info(self, song_url, on_search_error = None):
         while True:
@@ -263,27 +528,30 @@ class YtdlUrlEntry(Entry):
         except Exception as e:
             extractor._bot.log.error("Could not load {}".format(cls.__name__), exc_info=e)
 
+    def _index_cached(self, lfile):
+        """
+            Use information recorded in the cache index for a cached file.
+        """
+        record = self._extractor.cache_index.get(lfile)
+        if record and self.duration is None:
+            self.duration = record.get('duration')
+
     async def _prepare(self):
+        index = self._extractor.cache_index
         extractor = os.path.basename(self._expected_filename).split('-')[0]
 
         # the generic extractor requires special handling
         if extractor == 'generic':
-            flistdir = [f.rsplit('-', 1)[0] for f in os.listdir(self._download_folder)]
-            expected_fname_noex, fname_ex = os.path.basename(self._expected_filename).rsplit('.', 1)
+            lfile = index.lookup_generic(self._expected_filename)
 
-            if expected_fname_noex in flistdir:
+            if lfile:
                 try:
                     rsize = int(await get_header(self._extractor._bot.aiosession, self.source_url, 'CONTENT-LENGTH'))
                 except:
                     rsize = 0
 
-                lfile = os.path.join(
-                    self._download_folder,
-                    os.listdir(self._download_folder)[flistdir.index(expected_fname_noex)]
-                )
-
                 # print("Resolved %s to %s" % (self.expected_filename, lfile))
-                lsize = os.path.getsize(lfile)
+                lsize = index.get(lfile)['size']
                 # print("Remote size: %s Local size: %s" % (rsize, lsize))
 
                 if lsize != rsize:
@@ -291,70 +559,43 @@ class YtdlUrlEntry(Entry):
                 else:
                     # print("[Download] Cached:", self.url)
                     await self.set_local_url(lfile)
+                    self._index_cached(lfile)
 
             else:
                 # print("File not found in cache (%s)" % expected_fname_noex)
                 await self._really_download(hashing=True)
 
         else:
-            ldir = os.listdir(self._download_folder)
-            flistdir = [f.rsplit('.', 1)[0] for f in ldir]
             expected_fname_base = os.path.basename(self._expected_filename)
-            expected_fname_noex = expected_fname_base.rsplit('.', 1)[0]
-
-            # idk wtf this is but its probably legacy code
-            # or i have youtube to blame for changing shit again
 
             self._extractor._bot.log.info("Expecting file: {} in {}".format(expected_fname_base, self._download_folder))
 
-            if expected_fname_base in ldir:
-                await self.set_local_url(os.path.join(self._download_folder, expected_fname_base))
-                self._extractor._bot.log.info("Download cached: {}".format(self.source_url))
-
-            elif expected_fname_noex in flistdir:
-                self._extractor._bot.log.info("Download cached (different extension): {}".format(self.source_url))
-                await self.set_local_url(os.path.join(self._download_folder, ldir[flistdir.index(expected_fname_noex)]))
-                self._extractor._bot.log.debug("Expected {}, got {}".format(
-                    self._expected_filename.rsplit('.', 1)[-1],
-                    self._local_url.rsplit('.', 1)[-1]
-                ))
-            else:
-                await self._really_download()
-
-        if self.duration == None:
-            if pymediainfo:
-                try:
-                    mediainfo = pymediainfo.MediaInfo.parse(self.filename)
-                    self.duration = (mediainfo.tracks[0].duration)/1000
-                except:
-                    self.duration = None
+            lfile = index.lookup_url(self.source_url) or index.lookup_filename(self._expected_filename)
 
+            if lfile:
+                await self.set_local_url(lfile)
+                self._index_cached(lfile)
+                if os.path.basename(lfile) == expected_fname_base:
+                    self._extractor._bot.log.info("Download cached: {}".format(self.source_url))
+                else:
+                    # idk wtf this is but its probably legacy code
+                    # or i have youtube to blame for changing shit again
+                    self._extractor._bot.log.info("Download cached (different name): {}".format(self.source_url))
+                    self._extractor._bot.log.debug("Expected {}, got {}".format(
+                        expected_fname_base,
+                        os.path.basename(lfile)
+                    ))
             else:
-                args = [
-                    'ffprobe', 
-                    '-i', self.filename, 
-                    '-show_entries', 'format=duration', 
-                    '-v', 'quiet', 
-                    '-of', 'csv="p=0"'
-                ]
+                await self._really_download()
 
-                output = await run_command(' '.join(args))
-                output = output.decode("utf-8")
+        if self.duration == None and self._local_url:
+            self.duration = await probe_duration(self._local_url, self._extractor._bot.log)
+            if self.duration:
+                index.update(self._local_url, duration=self.duration)
+                index.schedule_save(self._extractor._bot.loop)
 
-                try:
-                    self.duration = float(output)
-                except ValueError:
-                    # @TheerapakG: If somehow it is not string of float
-                    self.duration = None
-
-            if not self.duration:
-                log.error('Cannot extract duration of downloaded entry, invalid output from ffprobe or pymediainfo. '
-                            'This does not affect the ability of the bot. However, estimated time for this entry '
-                            'will not be unavailable and estimated time of the queue will also not be available '
-                            'until this entry got removed.\n'
-                            'entry file: {}'.format(self.filename))
-            else:
-                log.debug('Get duration of {} as {} seconds by inspecting it directly'.format(self.filename, self.duration))
+        if self._local_url:
+            self._extractor.schedule_loudness(self._local_url)
 
     async def prepare_cache(self):
         with self._threadlocks['preparing_cache_set']:
@@ -373,6 +614,11 @@ class YtdlUrlEntry(Entry):
     async def _really_download(self, *, hashing=False):
         self._extractor._bot.log.info("Download started: {}".format(self.source_url))
 
+        # youtube_dl writes to .part and renames it when done, progressive playback can read it meanwhile.
+        # generic downloads get renamed again after hashing so they are not eligible.
+        if not hashing and self._expected_filename:
+            self._progressive_path = self._expected_filename + '.part'
+
         retry = True
         while retry:
             try:
@@ -390,10 +636,6 @@ class YtdlUrlEntry(Entry):
 
         unhashed_fname = self._extractor.ytdl.prepare_filename(result)
 
-
-        # TODO: check storage limit
-
-
         if hashing:
             # insert the 8 last characters of the file hash to the file name to ensure uniqueness
             await self.set_local_url(md5sum(unhashed_fname, 8).join('-.').join(unhashed_fname.rsplit('.', 1)))
@@ -406,8 +648,20 @@ class YtdlUrlEntry(Entry):
                 os.rename(unhashed_fname, self._local_url)
 
         else:
+            # only worth it when songs are played at the volume passthrough works at
+            if self._extractor._bot.config.opus_passthrough and self._extractor._bot.config.default_volume == 1.0:
+                unhashed_fname = await self._extractor.convert_to_opus(unhashed_fname)
             await self.set_local_url(unhashed_fname)
 
+        self._extractor.cache_index.add(
+            self._local_url,
+            source_url=self.source_url,
+            title=self.title,
+            duration=self.duration
+        )
+        self._extractor.cache_index.schedule_save(self._extractor._bot.loop)
+        self._extractor.cache_evictor.schedule(self._extractor._bot.loop)
+
 class YtdlUrlUnprocessedEntry(YtdlUrlEntry):
     def __init__(self, url, queuer_id, metadata, extractor):
         super().__init__(url, 'Information have not been fetched yet ({})'.format(url), None, queuer_id, metadata, extractor, None)
@@ -462,6 +716,16 @@ class YtdlUrlUnprocessedEntry(YtdlUrlEntry):
             self._preparing_cache = True
             
         try:
+            lfile = self._extractor.cache_index.lookup_url(self.source_url)
+            if lfile:
+                # already downloaded before, no need to ask youtube_dl about it again
+                record = self._extractor.cache_index.get(lfile)
+                self.title = record.get('title') or self.title
+                self.duration = record.get('duration')
+                self._expected_filename = lfile
+                await self._prepare()
+                return
+
             try:
                 info = await self._extractor.extract_info(self.source_url, download=False)
             except Exception as e:
@@ -514,11 +778,17 @@ class YtdlUrlUnprocessedEntry(YtdlUrlEntry):
                     self._preparing_cache = False
                     self._cached = True
 
+# resolved stream urls get resolved again this many seconds before they expire
+_url_refresh_margin = 300
+
 class YtdlStreamEntry(Entry):
     def __init__(self, source_url, title, queuer_id, metadata, extractor, destination = None):
         self._extractor = extractor
         super().__init__(source_url, title, None, queuer_id, metadata, stream = True)
         self._destination = destination
+        # unix time _local_url stops working if it tells
+        self._url_expiry = None
+        self._refresh_handle = None
 
     def __json__(self):
         return self._enclose_json({
@@ -576,21 +846,72 @@ class YtdlStreamEntry(Entry):
                     self._preparing_cache = False
                     self._cached = True
 
-    async def _really_download(self, *, fallback=False):
+    async def _resolve(self, *, fallback=False, fresh=False):
         url = self._destination if fallback else self.source_url
 
         try:
-            result = await self._extractor.extract_info(url, download=False)
+            # a fresh resolve is because the url known stopped working, cached info would give it back
+            return await self._extractor.extract_info(url, download=False, use_cache=not fresh)
         except Exception as e:
             if not fallback and self._destination:
-                return await self._really_download(fallback=True)
+                return await self._resolve(fallback=True, fresh=fresh)
 
             raise e
-        else:
-            await self.set_local_url(result['url'])
-            # I might need some sort of events or hooks or shit
-            # for when ffmpeg inevitebly fucks up and i have to restart
-            # although maybe that should be at a slightly lower level
+
+    async def resolve_url(self):
+        """
+        Resolve the stream again without changing the entry, for sources shared with other guilds.
+        """
+        return (await self._resolve(fresh=True))['url']
+
+    async def _really_download(self, *, fresh=False):
+        result = await self._resolve(fresh=fresh)
+        await self.set_local_url(result['url'])
+        self._url_expiry = url_expiry(result['url'])
+        self.is_live = result.get('is_live')
+        if not self.is_live and result.get('duration'):
+            self.duration = result['duration']
+        self._schedule_refresh()
+
+    def url_expired(self, margin=0):
+        return self._url_expiry is not None and time.time() + margin >= self._url_expiry
+
+    def _schedule_refresh(self):
+        if self._refresh_handle:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+        if self._url_expiry is None:
+            return
+        remaining = self._url_expiry - time.time()
+        # urls that live this short would be refreshed all the time, playback refreshes those if needed
+        if remaining < _url_refresh_margin * 2:
+            return
+        self._refresh_handle = self._extractor._bot.loop.call_later(
+            remaining - _url_refresh_margin,
+            lambda: asyncio.ensure_future(self._background_refresh())
+        )
+
+    async def _background_refresh(self):
+        self._refresh_handle = None
+        # entries leave url_map when they are done with, only refresh queued or playing ones
+        if not self._local_url or self not in url_map.get(self._local_url, ()):
+            return
+        try:
+            await self.refresh_url()
+            self._extractor.stats['stream_url_refreshed'] += 1
+        except Exception:
+            self._extractor._bot.log.warning('Could not refresh url of {} before it expires'.format(self.title), exc_info=True)
+
+    async def refresh_url(self):
+        """
+        Resolve the stream again when playing it stopped or its url expires, falling back to the
+        destination the same way preparing it does. Restarting ffmpeg is up to playback, see StreamWatchdog.
+        """
+        old_url = self._local_url
+        await self._really_download(fresh=True)
+        if old_url and self in url_map.get(old_url, ()):
+            url_map[old_url].remove(self)
+        return self._local_url
 
 class LocalEntry(Entry):
     def __init__(self, source_url, queuer_id, metadata):
@@ -640,12 +961,124 @@ class LocalEntry(Entry):
             self._preparing_cache = True
 
         self._local_url = self.source_url
+        if self.duration is None:
+            self.duration = await probe_duration(self._local_url, log)
 
         async with self._aiolocks['preparing_cache_set']:
             async with self._aiolocks['cached_set']:
                 self._preparing_cache = False
                 self._cached = True
 
+def flat_entry_url(entry):
+    """
+        Url of a playlist entry extracted with process=False, YouTube only gives the video id.
+    """
+    url = entry.get('webpage_url', None) or entry.get('url', None)
+    if url and '://' not in url and entry.get('ie_key', None) == 'Youtube':
+        return 'https://www.youtube.com/watch?v={}'.format(url)
+    return url
+
+def _mediainfo_duration(path):
+    mediainfo = pymediainfo.MediaInfo.parse(path)
+    return mediainfo.tracks[0].duration / 1000
+
+async def probe_duration(path, log):
+    """
+        Find duration of a local file in seconds, or None if it cannot be found. The container
+        headers are read directly, pymediainfo and ffprobe are only used for formats that are
+        not understood.
+    """
+    loop = asyncio.get_event_loop()
+    duration = await loop.run_in_executor(None, get_duration, path)
+
+    if not duration and pymediainfo:
+        try:
+            duration = await loop.run_in_executor(None, _mediainfo_duration, path)
+        except Exception:
+            duration = None
+
+    ffprobe = get_command('ffprobe')
+    if not duration and ffprobe:
+        p = await asyncio.create_subprocess_exec(
+            ffprobe,
+            '-i', path,
+            '-show_entries', 'format=duration',
+            '-v', 'quiet',
+            '-of', 'csv=p=0',
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        output, _ = await p.communicate()
+        try:
+            duration = float(output.decode('utf-8'))
+        except ValueError:
+            # @TheerapakG: If somehow it is not string of float
+            duration = None
+
+    if not duration:
+        # containers the header parser does not know are expected, this is not worth more than debug
+        log.debug('Cannot extract duration of {}. '
+                  'This does not affect the ability of the bot. However, estimated time for this entry '
+                  'will not be unavailable and estimated time of the queue will also not be available '
+                  'until this entry got removed.'.format(path))
+        return None
+
+    log.debug('Get duration of {} as {} seconds by inspecting it directly'.format(path, duration))
+    return duration
+
+def lazy_entries(info):
+    """
+        Whether info is a playlist extracted with process=False whose entries are a generator.
+    """
+    return isinstance(info, dict) and info.get('entries') is not None and not isinstance(info['entries'], list)
+
+class PagedEntries:
+    """
+        Asynchronously iterate entries of a playlist extracted with process=False. youtube_dl only
+        fetches the next page of the playlist when its entries generator is advanced, so pages
+        are pulled in the extractor threads, one page ahead of what is being consumed.
+        Each entry is passed to transform, falsy entries are given as None.
+    """
+    def __init__(self, extractor, entries, transform, page_size=50):
+        self._extractor = extractor
+        self._entries = iter(entries)
+        self._transform = transform
+        self._page_size = page_size
+        self._page = deque()
+        self._next_page = None
+        self._exhausted = False
+
+    def _take_page(self):
+        return list(islice(self._entries, self._page_size))
+
+    def _fetch_page(self):
+        if not self._exhausted and not self._next_page:
+            # only one page is fetched at a time, the generator is never advanced by two threads at once
+            self._next_page = self._extractor._bot.loop.run_in_executor(self._extractor.thread_pool, self._take_page)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._page and not self._exhausted:
+            self._fetch_page()
+            try:
+                page = await self._next_page
+            except Exception as e:
+                self._extractor._bot.log.warning('Could not get the rest of the playlist: {}'.format(e))
+                page = []
+            self._next_page = None
+            if len(page) < self._page_size:
+                self._exhausted = True
+            self._page.extend(page)
+            self._fetch_page()
+
+        if not self._page:
+            raise StopAsyncIteration
+
+        item = self._page.popleft()
+        return self._transform(item) if item else None
+
 class WrongEntryTypeError(Exception):
     def __init__(self, message, is_playlist, use_url):
         super().__init__(message)
@@ -0,0 +1,166 @@
+"""
+Subprocess isolated youtube_dl workers.
+
+A hung extractor in a thread can never be cancelled, a process can be killed.
+Each ExtractorProcess is owned by exactly one executor thread of YtdlDownloader,
+so a worker only ever runs one job at a time and no locking is needed around the pipe.
+"""
+
+import pickle
+import logging
+import threading
+import multiprocessing
+
+import youtube_dl
+from youtube_dl.utils import DownloadError
+
+from .exceptions import ExtractionError
+
+log = logging.getLogger(__name__)
+
+# spawn instead of fork, forking a process that already has running threads is asking for deadlocks
+_mp_context = multiprocessing.get_context('spawn')
+
+class ExtractionTimeout(ExtractionError):
+    pass
+
+def _pack_exception(e):
+    if isinstance(e, DownloadError):
+        exc_type, exc_value = (e.exc_info[0], e.exc_info[1]) if e.exc_info else (None, None)
+        try:
+            return pickle.dumps(('download_error', (str(e), exc_type, exc_value)))
+        except Exception:
+            return pickle.dumps(('download_error', (str(e), exc_type, None)))
+
+    try:
+        return pickle.dumps(('error', e))
+    except Exception:
+        return pickle.dumps(('error', ExtractionError('{}: {}'.format(type(e).__name__, e))))
+
+def _worker_main(conn, params):
+    youtube_dl.utils.bug_reports_message = lambda: ''
+    ytdls = {safe: youtube_dl.YoutubeDL(p) for safe, p in params.items()}
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+
+        if job is None:
+            return
+
+        safe, args, kwargs = job
+        try:
+            info = ytdls[safe].extract_info(*args, **kwargs)
+            # generators cannot cross the pipe
+            if info and 'entries' in info and not isinstance(info['entries'], list):
+                info['entries'] = list(info['entries'])
+            data = pickle.dumps(('ok', info))
+        except Exception as e:
+            data = _pack_exception(e)
+
+        try:
+            conn.send_bytes(data)
+        except (BrokenPipeError, EOFError):
+            return
+
+class ExtractorProcess:
+    def __init__(self, params):
+        self._conn, child_conn = _mp_context.Pipe()
+        self.process = _mp_context.Process(target=_worker_main, args=(child_conn, params), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def run(self, timeout, safe, args, kwargs):
+        self.jobs += 1
+        try:
+            self._conn.send((safe, args, kwargs))
+            if not self._conn.poll(timeout):
+                self.kill()
+                raise ExtractionTimeout('Extraction of {} did not finish in {} seconds'.format(args[0] if args else '', timeout))
+            status, payload = pickle.loads(self._conn.recv_bytes())
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            self.kill()
+            raise ExtractionError('Extractor process died while extracting {}'.format(args[0] if args else ''))
+
+        if status == 'ok':
+            return payload
+        elif status == 'download_error':
+            msg, exc_type, exc_value = payload
+            raise DownloadError(msg, (exc_type, exc_value, None))
+        else:
+            raise payload
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(5)
+        self._conn.close()
+
+    def close(self):
+        if self.process.is_alive():
+            try:
+                self._conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(5)
+        self.kill()
+
+class ExtractorProcessPool:
+    """
+    Hand out one worker process per calling thread, recycling them after max_jobs jobs.
+    """
+    def __init__(self, params, max_jobs):
+        self.params = params
+        self.max_jobs = max_jobs
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._processes = set()
+
+    def _get_process(self):
+        proc = getattr(self._local, 'process', None)
+        if proc and (not proc.alive or (self.max_jobs and proc.jobs >= self.max_jobs)):
+            log.debug('Recycling extractor process {}'.format(proc.process.pid))
+            self._discard(proc)
+            proc.close()
+            proc = None
+
+        if not proc:
+            proc = ExtractorProcess(self.params)
+            with self._lock:
+                self._processes.add(proc)
+            self._local.process = proc
+
+        return proc
+
+    def _discard(self, proc):
+        with self._lock:
+            self._processes.discard(proc)
+        if getattr(self._local, 'process', None) is proc:
+            self._local.process = None
+
+    def run(self, timeout, safe, *args, **kwargs):
+        proc = self._get_process()
+        try:
+            return proc.run(timeout, safe, args, kwargs)
+        except ExtractionTimeout:
+            log.warning('Killed extractor process {} after {} seconds'.format(proc.process.pid, timeout))
+            self._discard(proc)
+            raise
+        except ExtractionError:
+            if not proc.alive:
+                self._discard(proc)
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            processes = self._processes.copy()
+            self._processes.clear()
+        for proc in processes:
+            proc.close()